@@ -0,0 +1,228 @@
+"""
+This is a benchmark suite comparing the finite validation strategies in
+this folder:
+1) `sequence_values_are_finite`: an `in` check against a list literal per value
+2) `value_equality_based_sequence_values_are_finite`: three `==` checks per value
+3) `fixed_sequence_values_are_finite`: `all(map(math.isfinite, ...))`
+4) `values_are_finite`: the bulk buffer backend, with the generic fallback
+
+Each strategy is timed for every combination of container type (list, tuple,
+`array("d")`), input size, and position of the first non-finite value (none,
+start, middle, end). The non-finite value used is `math.inf` since all of the
+strategies detect it correctly, unlike `float("nan")`.
+
+Results are written as JSON so that runs can be compared between releases:
+`python3 ./benchmark_validation_code.py --output results.json`
+
+Large sizes take a long time and several GB of memory for lists and tuples,
+so `--max-exponent` can lower the largest size (10**8 by default).
+
+`python3 -m unittest ./benchmark_validation_code.py` will run unit tests.
+"""
+
+import argparse
+from array import array
+from collections.abc import Callable, Sequence
+from dataclasses import asdict, dataclass
+import datetime
+import json
+import math
+import os
+import platform
+import sys
+import tempfile
+import timeit
+import unittest
+
+from buffer_validation_code import values_are_finite
+from fixed_validation_code import fixed_sequence_values_are_finite
+from original_validation_code import sequence_values_are_finite
+from value_equality_validation_code import (
+    value_equality_based_sequence_values_are_finite,
+)
+
+STRATEGIES: dict[str, Callable[[Sequence[float]], bool]] = {
+    "original": sequence_values_are_finite,
+    "value_equality": value_equality_based_sequence_values_are_finite,
+    "fixed": fixed_sequence_values_are_finite,
+    "buffer": values_are_finite,
+}
+
+CONTAINERS: dict[str, Callable[[list[float]], Sequence[float]]] = {
+    "list": lambda values: values,
+    "tuple": tuple,
+    "array": lambda values: array("d", values),
+}
+
+NON_FINITE_POSITIONS: tuple[str, ...] = ("none", "start", "middle", "end")
+
+
+@dataclass(frozen=True)
+class BenchmarkResult:
+    strategy: str
+    container: str
+    size: int
+    non_finite_position: str
+    # Best time of a single call across the repeats
+    seconds: float
+    # What the strategy returned, to catch a broken strategy skewing timings
+    result: bool
+
+
+def non_finite_index(size: int, position: str) -> int | None:
+    """
+    Returns the index to place the non-finite value at for a named position,
+    or None if the input should be all finite.
+    """
+    match position:
+        case "none":
+            return None
+        case "start":
+            return 0
+        case "middle":
+            return size // 2
+        case "end":
+            return size - 1
+        case _:
+            raise ValueError(f"Unknown non-finite position {position!r}")
+
+
+def build_input(container: str, size: int, position: str) -> Sequence[float]:
+    """
+    Returns `size` finite values in the named container type, with `math.inf`
+    at the named position.
+    """
+    values: list[float] = [1.0] * size
+    index: int | None = non_finite_index(size, position)
+    if index is not None:
+        values[index] = math.inf
+    return CONTAINERS[container](values)
+
+
+def run_benchmarks(
+    sizes: Sequence[int], repeat: int = 3, strategies: Sequence[str] | None = None
+) -> list[BenchmarkResult]:
+    """
+    Times each strategy for every container, size, and non-finite position.
+    """
+    strategy_names: Sequence[str] = strategies or list(STRATEGIES)
+    results: list[BenchmarkResult] = []
+    for container in CONTAINERS:
+        for size in sizes:
+            for position in NON_FINITE_POSITIONS:
+                # Only one input is alive at a time, since large ones are huge
+                input_values: Sequence[float] = build_input(container, size, position)
+                for name in strategy_names:
+                    strategy: Callable[[Sequence[float]], bool] = STRATEGIES[name]
+                    seconds: float = min(
+                        timeit.repeat(
+                            lambda: strategy(input_values), repeat=repeat, number=1
+                        )
+                    )
+                    results.append(
+                        BenchmarkResult(
+                            strategy=name,
+                            container=container,
+                            size=size,
+                            non_finite_position=position,
+                            seconds=seconds,
+                            result=strategy(input_values),
+                        )
+                    )
+                del input_values
+    return results
+
+
+def write_results(results: Sequence[BenchmarkResult], output_path: str) -> None:
+    """
+    Writes the results along with details of the environment they came from.
+    """
+    report: dict[str, object] = {
+        "created": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "python_version": sys.version,
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "results": [asdict(result) for result in results],
+    }
+    with open(output_path, "w") as output_file:
+        json.dump(report, output_file, indent=2)
+
+
+########
+# Main #
+########
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Benchmarks the finite validation strategies in this folder."
+    )
+    parser.add_argument("--output", default="validation_benchmark.json")
+    parser.add_argument("--min-exponent", type=int, default=1)
+    parser.add_argument("--max-exponent", type=int, default=8)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument(
+        "--strategy", action="append", choices=list(STRATEGIES), dest="strategies"
+    )
+    args = parser.parse_args()
+
+    sizes: list[int] = [
+        10**exponent for exponent in range(args.min_exponent, args.max_exponent + 1)
+    ]
+    results: list[BenchmarkResult] = run_benchmarks(sizes, args.repeat, args.strategies)
+    write_results(results, args.output)
+
+    for result in results:
+        print(
+            f"{result.strategy:>15} {result.container:>6} {result.size:>10}"
+            f" {result.non_finite_position:>7} {result.seconds:>12.6f}s"
+        )
+    print(f"Wrote {len(results)} results to {args.output}")
+
+
+###########
+# Testing #
+###########
+class TestBuildInput(unittest.TestCase):
+    def test_positions(self) -> None:
+        self.assertEqual(list(build_input("list", 3, "none")), [1.0, 1.0, 1.0])
+        self.assertEqual(list(build_input("list", 3, "start")), [math.inf, 1.0, 1.0])
+        self.assertEqual(list(build_input("list", 3, "middle")), [1.0, math.inf, 1.0])
+        self.assertEqual(list(build_input("list", 3, "end")), [1.0, 1.0, math.inf])
+
+    def test_containers(self) -> None:
+        self.assertIsInstance(build_input("list", 2, "none"), list)
+        self.assertIsInstance(build_input("tuple", 2, "none"), tuple)
+        self.assertIsInstance(build_input("array", 2, "none"), array)
+
+    def test_unknown_position_raises(self) -> None:
+        with self.assertRaises(ValueError):
+            build_input("list", 2, "sideways")
+
+
+class TestRunBenchmarks(unittest.TestCase):
+    def test_covers_every_combination(self) -> None:
+        results: list[BenchmarkResult] = run_benchmarks([10, 100], repeat=1)
+        self.assertEqual(
+            len(results),
+            len(STRATEGIES) * len(CONTAINERS) * 2 * len(NON_FINITE_POSITIONS),
+        )
+        for result in results:
+            self.assertEqual(result.result, result.non_finite_position == "none")
+
+    def test_writes_json(self) -> None:
+        results: list[BenchmarkResult] = run_benchmarks(
+            [10], repeat=1, strategies=["fixed"]
+        )
+        with tempfile.TemporaryDirectory() as temp_dir:
+            output_path: str = os.path.join(temp_dir, "results.json")
+            write_results(results, output_path)
+            with open(output_path) as output_file:
+                report = json.load(output_file)
+        self.assertEqual(len(report["results"]), len(results))
+        self.assertEqual(report["results"][0]["strategy"], "fixed")
+
+
+if __name__ == "__main__":
+    main()
+
+    # The benchmark options were already parsed by main()
+    unittest.main(argv=sys.argv[:1])
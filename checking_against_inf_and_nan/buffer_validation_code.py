@@ -0,0 +1,256 @@
+"""
+This is a bulk version of the fixed validation code for inputs that expose
+the buffer protocol as packed float64 values, such as `array("d")`,
+`memoryview`, NumPy float64 arrays, or `bytes` of packed doubles.
+
+`fixed_sequence_values_are_finite` turns every element into a Python float
+and calls `math.isfinite` on it. Here the raw IEEE 754 bytes are inspected
+instead: a double is infinity or NaN exactly when all 11 exponent bits are
+set. Only the byte holding the top exponent bits is gathered per element
+(in bounded chunks), so the scan runs in C without creating float objects.
+
+`values_are_finite` uses the buffer path when it can and falls back to
+`fixed_sequence_values_are_finite` for any other `Sequence[float]`.
+
+`python3 ./buffer_validation_code.py` will run unit tests.
+"""
+
+from array import array
+from collections.abc import Buffer, Iterator, Sequence
+import math
+import struct
+import sys
+import unittest
+
+from fixed_validation_code import fixed_sequence_values_are_finite
+
+FLOAT64_SIZE: int = 8
+
+# Number of elements gathered per chunk, which bounds the temporary memory
+DEFAULT_CHUNK_ELEMENTS: int = 1 << 16
+
+# Offsets within a float64 of the byte holding the sign and top 7 exponent bits,
+# and of the byte holding the remaining 4 exponent bits
+_HIGH_BYTE_OFFSET: int = 7 if sys.byteorder == "little" else 0
+_LOW_BYTE_OFFSET: int = 6 if sys.byteorder == "little" else 1
+
+# Maps a high byte to b"\x01" if its 7 exponent bits are all set, else b"\x00"
+_CANDIDATE_TABLE: bytes = bytes(1 if byte & 0x7F == 0x7F else 0 for byte in range(256))
+
+_FLOAT64_FORMATS: frozenset[str] = frozenset({"d", "@d"})
+_RAW_BYTE_FORMATS: frozenset[str] = frozenset({"B", "b", "c", "@B", "@b", "@c"})
+
+
+def as_float64_view(input_buffer: Buffer) -> "memoryview[float]":
+    """
+    Given an object supporting the buffer protocol, returns a flat memoryview
+    of native float64 values over the same memory (no data is copied).
+
+    Raw byte buffers (eg: `bytes`, `bytearray`) are reinterpreted as packed doubles.
+
+    Raises TypeError if the buffer does not hold float64 values or raw bytes,
+    and ValueError if it is not C-contiguous or is not a whole number of doubles.
+    """
+    view: memoryview = memoryview(input_buffer)
+    if view.format not in _FLOAT64_FORMATS and view.format not in _RAW_BYTE_FORMATS:
+        raise TypeError(
+            f"Buffer format {view.format!r} is not float64 ('d') or raw bytes"
+        )
+    if not view.c_contiguous:
+        raise ValueError("Buffer must be C-contiguous")
+    if view.nbytes % FLOAT64_SIZE:
+        raise ValueError(
+            f"Buffer of {view.nbytes} bytes is not a whole number of float64 values"
+        )
+    return view.cast("B").cast("d")
+
+
+def buffer_non_finite_indices(
+    input_buffer: Buffer, start: int = 0, chunk_elements: int = DEFAULT_CHUNK_ELEMENTS
+) -> Iterator[int]:
+    """
+    Given a buffer of float64 values, yields in order the index of every value
+    at or after `start` that is infinity, negative infinity, or not a number.
+
+    The buffer is scanned once, one chunk at a time as the indices are consumed.
+    """
+    values: "memoryview[float]" = as_float64_view(input_buffer)
+    raw: memoryview = values.cast("B")
+    num_values: int = len(values)
+
+    for chunk_start in range(start, num_values, chunk_elements):
+        chunk_stop: int = min(chunk_start + chunk_elements, num_values)
+        # Gather just one byte per value, then mark the ones whose top 7 exponent
+        # bits are set. Finite values this large (over 2**1008) are rare, so the
+        # per-candidate check below almost never runs for real data.
+        candidates: bytes = bytes(
+            raw[
+                chunk_start * FLOAT64_SIZE
+                + _HIGH_BYTE_OFFSET : chunk_stop * FLOAT64_SIZE : FLOAT64_SIZE
+            ]
+        ).translate(_CANDIDATE_TABLE)
+
+        position: int = candidates.find(1)
+        while position != -1:
+            index: int = chunk_start + position
+            if raw[index * FLOAT64_SIZE + _LOW_BYTE_OFFSET] & 0xF0 == 0xF0:
+                yield index
+            position = candidates.find(1, position + 1)
+
+
+def buffer_first_non_finite_index(
+    input_buffer: Buffer, start: int = 0, chunk_elements: int = DEFAULT_CHUNK_ELEMENTS
+) -> int:
+    """
+    Given a buffer of float64 values, returns the index of the first value
+    at or after `start` that is infinity, negative infinity, or not a number.
+
+    Returns -1 if all of those values are finite.
+    """
+    return next(buffer_non_finite_indices(input_buffer, start, chunk_elements), -1)
+
+
+def buffer_values_are_finite(input_buffer: Buffer) -> bool:
+    """
+    Given a buffer of float64 values checks that none of the values
+    are infinity, negative infinity, or not a number (therefore finite).
+
+    Returns True if all values are finite, otherwise False.
+    """
+    return buffer_first_non_finite_index(input_buffer) == -1
+
+
+def values_are_finite(input_values: Sequence[float] | Buffer) -> bool:
+    """
+    Given a float64 buffer or a sequence of floats checks that none of the
+    values are infinity, negative infinity, or not a number (therefore finite).
+
+    Buffers of float64 values or raw bytes are checked in bulk, anything else
+    goes through `fixed_sequence_values_are_finite`.
+
+    Returns True if all values are finite, otherwise False.
+
+    Raises ValueError for a float64 or raw byte buffer that `as_float64_view`
+    rejects, such as bytes that are not a whole number of doubles.
+    """
+    if isinstance(input_values, Buffer):
+        try:
+            return buffer_values_are_finite(input_values)
+        except TypeError:
+            # Not a float64 buffer (eg: `array("f")`), so use the generic path
+            pass
+    if not isinstance(input_values, Sequence):
+        raise TypeError(f"Cannot check values of type {type(input_values).__name__}")
+    return fixed_sequence_values_are_finite(input_values)
+
+
+###########
+# Testing #
+###########
+class TestBufferValuesAreFinite(unittest.TestCase):
+    def test_empty_buffer(self) -> None:
+        self.assertTrue(buffer_values_are_finite(array("d")))
+
+    def test_valid_array(self) -> None:
+        self.assertTrue(
+            buffer_values_are_finite(array("d", [1.0, 0.0, -42.0, 47102378931.0]))
+        )
+
+    def test_largest_finite_values(self) -> None:
+        # These have all but one exponent bit set, so are candidates but finite
+        self.assertTrue(
+            buffer_values_are_finite(
+                array("d", [sys.float_info.max, -1e308, 2.0**1023])
+            )
+        )
+
+    def test_has_infinity(self) -> None:
+        self.assertFalse(buffer_values_are_finite(array("d", [1.0, math.inf, -2.0])))
+
+    def test_has_negative_infinity(self) -> None:
+        self.assertFalse(buffer_values_are_finite(array("d", [1.0, -2.0, -math.inf])))
+
+    def test_has_math_nan(self) -> None:
+        self.assertFalse(buffer_values_are_finite(array("d", [math.nan, 1.0, -2.0])))
+
+    def test_has_float_nan(self) -> None:
+        self.assertFalse(
+            buffer_values_are_finite(array("d", [float("nan"), 1.0, -2.0]))
+        )
+
+    def test_has_negative_nan(self) -> None:
+        self.assertFalse(buffer_values_are_finite(array("d", [1.0, -math.nan])))
+
+    def test_memoryview(self) -> None:
+        values: array[float] = array("d", [1.0, 2.0, math.inf])
+        self.assertTrue(buffer_values_are_finite(memoryview(values)[:2]))
+        self.assertFalse(buffer_values_are_finite(memoryview(values)))
+
+    def test_packed_bytes(self) -> None:
+        self.assertTrue(buffer_values_are_finite(struct.pack("=3d", 1.0, 2.0, 3.0)))
+        self.assertFalse(
+            buffer_values_are_finite(bytearray(struct.pack("=2d", 1.0, math.nan)))
+        )
+
+    def test_partial_double_raises(self) -> None:
+        with self.assertRaises(ValueError):
+            buffer_values_are_finite(b"\x00" * 12)
+
+    def test_wrong_format_raises(self) -> None:
+        with self.assertRaises(TypeError):
+            buffer_values_are_finite(array("f", [1.0]))
+
+    def test_non_contiguous_raises(self) -> None:
+        with self.assertRaises(ValueError):
+            buffer_values_are_finite(memoryview(array("d", [1.0, 2.0, 3.0]))[::2])
+
+
+class TestBufferFirstNonFiniteIndex(unittest.TestCase):
+    def test_all_finite(self) -> None:
+        self.assertEqual(buffer_first_non_finite_index(array("d", [1.0, 2.0])), -1)
+
+    def test_finds_first(self) -> None:
+        values: array[float] = array("d", [1.0, math.nan, 2.0, math.inf])
+        self.assertEqual(buffer_first_non_finite_index(values), 1)
+        self.assertEqual(buffer_first_non_finite_index(values, start=2), 3)
+
+    def test_across_chunks(self) -> None:
+        values: array[float] = array("d", [1e308]) * 100
+        values[77] = -math.inf
+        self.assertEqual(buffer_first_non_finite_index(values, chunk_elements=8), 77)
+
+
+class TestBufferNonFiniteIndices(unittest.TestCase):
+    def test_all_finite(self) -> None:
+        self.assertEqual(list(buffer_non_finite_indices(array("d", [1.0, 2.0]))), [])
+
+    def test_finds_all_across_chunks(self) -> None:
+        values: array[float] = array("d", [math.nan]) * 20
+        values[3] = 1e308
+        self.assertEqual(
+            list(buffer_non_finite_indices(values, start=2, chunk_elements=8)),
+            [2] + list(range(4, 20)),
+        )
+
+
+class TestValuesAreFinite(unittest.TestCase):
+    def test_list_fallback(self) -> None:
+        self.assertTrue(values_are_finite([1.0, 2.0]))
+        self.assertFalse(values_are_finite((1.0, float("nan"))))
+
+    def test_float32_array_fallback(self) -> None:
+        self.assertTrue(values_are_finite(array("f", [1.0, 2.0])))
+        self.assertFalse(values_are_finite(array("f", [1.0, math.inf])))
+
+    def test_float64_buffer(self) -> None:
+        self.assertTrue(values_are_finite(array("d", [1.0, 2.0])))
+        self.assertFalse(values_are_finite(array("d", [1.0, -math.inf])))
+
+    def test_partial_double_raises(self) -> None:
+        # Falling back would check each byte as a number and miss the infinity
+        with self.assertRaises(ValueError):
+            values_are_finite(struct.pack("=d", math.inf) + b"\x00" * 4)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,224 @@
+"""
+This builds on the fixed validation code to explain *why* a sequence is
+not finite, rather than only returning True or False.
+
+`non_finite_census` makes a single pass over the input and counts the
+infinity, negative infinity, and NaN values. It also records which
+positions held them in a bit-packed bitmap (one bit per input value), so
+memory stays small even when most of a huge input is bad. Passing
+`max_offenders` stops the scan once that many non-finite values are found.
+
+Float64 buffers (eg: `array("d")`) are scanned with the bulk buffer backend,
+so only the non-finite values are ever turned into Python floats.
+
+`python3 ./census_validation_code.py` will run unit tests.
+"""
+
+from array import array
+from collections.abc import Buffer, Iterable, Iterator, Sequence
+from dataclasses import dataclass, field
+import math
+import struct
+import unittest
+
+from buffer_validation_code import as_float64_view, buffer_non_finite_indices
+
+
+@dataclass
+class NonFiniteCensus:
+    # Number of input values, and how many of them were examined before stopping
+    num_values: int
+    num_scanned: int = 0
+    positive_infinity_count: int = 0
+    negative_infinity_count: int = 0
+    nan_count: int = 0
+    # Bit `i % 8` of byte `i // 8` is set when value `i` is not finite
+    offender_bitmap: bytearray = field(default_factory=bytearray)
+
+    def __post_init__(self) -> None:
+        if not self.offender_bitmap:
+            self.offender_bitmap = bytearray((self.num_values + 7) // 8)
+
+    @property
+    def non_finite_count(self) -> int:
+        return (
+            self.positive_infinity_count + self.negative_infinity_count + self.nan_count
+        )
+
+    @property
+    def stopped_early(self) -> bool:
+        return self.num_scanned < self.num_values
+
+    def all_finite(self) -> bool:
+        """
+        Returns True if every input value was scanned and all were finite.
+        """
+        return not self.stopped_early and self.non_finite_count == 0
+
+    def is_offender(self, index: int) -> bool:
+        """
+        Returns True if the value at `index` was found to be non-finite.
+        """
+        if not 0 <= index < self.num_values:
+            raise IndexError(f"Index {index} out of range for {self.num_values} values")
+        return bool(self.offender_bitmap[index >> 3] & (1 << (index & 7)))
+
+    def offender_indices(self) -> Iterator[int]:
+        """
+        Yields the indices of the non-finite values found, in order.
+        """
+        for byte_index, byte in enumerate(self.offender_bitmap):
+            while byte:
+                lowest_bit: int = byte & -byte
+                yield (byte_index << 3) + lowest_bit.bit_length() - 1
+                byte ^= lowest_bit
+
+    def record(self, index: int, value: float) -> None:
+        """
+        Adds the non-finite `value` found at `index` to the counts and bitmap.
+        """
+        if math.isnan(value):
+            self.nan_count += 1
+        elif value > 0:
+            self.positive_infinity_count += 1
+        else:
+            self.negative_infinity_count += 1
+        self.offender_bitmap[index >> 3] |= 1 << (index & 7)
+
+
+def _census_of_offenders(
+    census: NonFiniteCensus,
+    offenders: Iterable[tuple[int, float]],
+    max_offenders: int | None,
+) -> NonFiniteCensus:
+    """
+    Records each (index, value) offender until `max_offenders` have been seen.
+    """
+    census.num_scanned = census.num_values
+    for index, value in offenders:
+        census.record(index, value)
+        if max_offenders is not None and census.non_finite_count >= max_offenders:
+            census.num_scanned = index + 1
+            break
+    return census
+
+
+def non_finite_census(
+    input_values: Sequence[float] | Buffer, max_offenders: int | None = None
+) -> NonFiniteCensus:
+    """
+    Given a float64 buffer or a sequence of floats, counts the values that
+    are infinity, negative infinity, or not a number in a single pass and
+    marks their positions in a bitmap.
+
+    If `max_offenders` is given the scan stops after that many non-finite
+    values, and `num_scanned` on the result says how far it got.
+
+    Raises ValueError for a float64 or raw byte buffer that `as_float64_view`
+    rejects, such as bytes that are not a whole number of doubles.
+    """
+    if max_offenders is not None and max_offenders < 1:
+        raise ValueError(f"max_offenders must be at least 1, got {max_offenders}")
+
+    if isinstance(input_values, Buffer):
+        try:
+            values: "memoryview[float]" = as_float64_view(input_values)
+        except TypeError:
+            # Not a float64 buffer (eg: `array("f")`), so use the generic path
+            pass
+        else:
+            return _census_of_offenders(
+                NonFiniteCensus(len(values)),
+                ((index, values[index]) for index in buffer_non_finite_indices(values)),
+                max_offenders,
+            )
+
+    if not isinstance(input_values, Sequence):
+        raise TypeError(f"Cannot check values of type {type(input_values).__name__}")
+    return _census_of_offenders(
+        NonFiniteCensus(len(input_values)),
+        (
+            (index, value)
+            for index, value in enumerate(input_values)
+            if not math.isfinite(value)
+        ),
+        max_offenders,
+    )
+
+
+###########
+# Testing #
+###########
+class TestNonFiniteCensus(unittest.TestCase):
+    def test_empty_sequence(self) -> None:
+        census: NonFiniteCensus = non_finite_census([])
+        self.assertTrue(census.all_finite())
+        self.assertEqual(census.offender_bitmap, bytearray())
+
+    def test_valid_sequence(self) -> None:
+        census: NonFiniteCensus = non_finite_census([1.0, 0.0, -42.0, 47102378931.0])
+        self.assertTrue(census.all_finite())
+        self.assertEqual(census.num_scanned, 4)
+        self.assertEqual(list(census.offender_indices()), [])
+
+    def test_counts_each_kind(self) -> None:
+        values: list[float] = [
+            math.inf,
+            1.0,
+            float("nan"),
+            -math.inf,
+            math.nan,
+            float("-inf"),
+            2.0,
+            -2.0,
+            float("inf"),
+        ]
+        for input_values in (values, tuple(values), array("d", values)):
+            census: NonFiniteCensus = non_finite_census(input_values)
+            self.assertFalse(census.all_finite())
+            self.assertEqual(census.positive_infinity_count, 2)
+            self.assertEqual(census.negative_infinity_count, 2)
+            self.assertEqual(census.nan_count, 2)
+            self.assertEqual(census.non_finite_count, 6)
+            self.assertEqual(list(census.offender_indices()), [0, 2, 3, 4, 5, 8])
+            self.assertEqual(census.offender_bitmap, bytearray([0b00111101, 0b1]))
+
+    def test_is_offender(self) -> None:
+        census: NonFiniteCensus = non_finite_census([1.0, math.nan, 2.0])
+        self.assertFalse(census.is_offender(0))
+        self.assertTrue(census.is_offender(1))
+        with self.assertRaises(IndexError):
+            census.is_offender(3)
+
+    def test_max_offenders_stops_early(self) -> None:
+        values: list[float] = [1.0, math.inf, 2.0, math.nan, -math.inf, 3.0]
+        for input_values in (values, array("d", values)):
+            census: NonFiniteCensus = non_finite_census(input_values, max_offenders=2)
+            self.assertTrue(census.stopped_early)
+            self.assertFalse(census.all_finite())
+            self.assertEqual(census.num_scanned, 4)
+            self.assertEqual(census.non_finite_count, 2)
+            self.assertEqual(list(census.offender_indices()), [1, 3])
+
+    def test_max_offenders_not_reached(self) -> None:
+        census: NonFiniteCensus = non_finite_census([math.nan, 1.0], max_offenders=2)
+        self.assertFalse(census.stopped_early)
+        self.assertEqual(census.num_scanned, 2)
+
+    def test_invalid_max_offenders_raises(self) -> None:
+        with self.assertRaises(ValueError):
+            non_finite_census([1.0], max_offenders=0)
+
+    def test_partial_double_raises(self) -> None:
+        # Falling back would count each byte as a value and miss the infinity
+        with self.assertRaises(ValueError):
+            non_finite_census(struct.pack("=d", math.inf) + b"\x00" * 4)
+
+    def test_float32_array_fallback(self) -> None:
+        census: NonFiniteCensus = non_finite_census(array("f", [1.0, math.inf]))
+        self.assertEqual(census.positive_infinity_count, 1)
+        self.assertEqual(list(census.offender_indices()), [1])
+
+
+if __name__ == "__main__":
+    unittest.main()
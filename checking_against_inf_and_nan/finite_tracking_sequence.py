@@ -0,0 +1,224 @@
+"""
+This is a mutable sequence of floats that keeps a running count of its
+non-finite values (infinity, negative infinity, or not a number).
+
+Calling `fixed_sequence_values_are_finite` after every small change to a
+buffer rescans all of it. `FiniteTrackingSequence` instead updates the count
+on every `append`, `extend`, `insert`, item or slice assignment, and `del`,
+only looking at the values being added or removed. Checking that every value
+is finite is then O(1) with `all_finite`.
+
+It implements `MutableSequence[float]`, so it can be passed anywhere a
+`Sequence[float]` is expected, including the validators in this folder.
+
+`python3 ./finite_tracking_sequence.py` will run unit tests.
+"""
+
+from collections.abc import Iterable, Iterator, MutableSequence
+import math
+from typing import overload
+import unittest
+
+from fixed_validation_code import fixed_sequence_values_are_finite
+
+
+def _count_non_finite(values: Iterable[float]) -> int:
+    return sum(not math.isfinite(value) for value in values)
+
+
+class FiniteTrackingSequence(MutableSequence[float]):
+    def __init__(self, values: Iterable[float] = ()) -> None:
+        self._values: list[float] = list(values)
+        self._non_finite_count: int = _count_non_finite(self._values)
+
+    @property
+    def non_finite_count(self) -> int:
+        return self._non_finite_count
+
+    def all_finite(self) -> bool:
+        """
+        Returns True if all values are finite, otherwise False, without a scan.
+        """
+        return self._non_finite_count == 0
+
+    def __len__(self) -> int:
+        return len(self._values)
+
+    def __iter__(self) -> Iterator[float]:
+        return iter(self._values)
+
+    def __contains__(self, value: object) -> bool:
+        return value in self._values
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self._values!r})"
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, FiniteTrackingSequence):
+            return self._values == other._values
+        if isinstance(other, list):
+            return self._values == other
+        return NotImplemented
+
+    @overload
+    def __getitem__(self, index: int) -> float: ...
+
+    @overload
+    def __getitem__(self, index: slice) -> "FiniteTrackingSequence": ...
+
+    def __getitem__(self, index: int | slice) -> "float | FiniteTrackingSequence":
+        if isinstance(index, slice):
+            return FiniteTrackingSequence(self._values[index])
+        return self._values[index]
+
+    @overload
+    def __setitem__(self, index: int, value: float) -> None: ...
+
+    @overload
+    def __setitem__(self, index: slice, value: Iterable[float]) -> None: ...
+
+    def __setitem__(self, index: int | slice, value: float | Iterable[float]) -> None:
+        if isinstance(index, slice):
+            assert isinstance(value, Iterable)
+            new_values: list[float] = list(value)
+            removed_count: int = _count_non_finite(self._values[index])
+            # Assign first, so a bad extended slice length leaves the count alone
+            self._values[index] = new_values
+            self._non_finite_count += _count_non_finite(new_values) - removed_count
+        else:
+            assert not isinstance(value, Iterable)
+            old_value: float = self._values[index]
+            self._values[index] = value
+            self._non_finite_count += (not math.isfinite(value)) - (
+                not math.isfinite(old_value)
+            )
+
+    def __delitem__(self, index: int | slice) -> None:
+        if isinstance(index, slice):
+            removed_count: int = _count_non_finite(self._values[index])
+        else:
+            removed_count = not math.isfinite(self._values[index])
+        del self._values[index]
+        self._non_finite_count -= removed_count
+
+    def insert(self, index: int, value: float) -> None:
+        self._values.insert(index, value)
+        self._non_finite_count += not math.isfinite(value)
+
+    def append(self, value: float) -> None:
+        self._values.append(value)
+        self._non_finite_count += not math.isfinite(value)
+
+    def extend(self, values: Iterable[float]) -> None:
+        new_values: list[float] = list(values)
+        self._values.extend(new_values)
+        self._non_finite_count += _count_non_finite(new_values)
+
+    def clear(self) -> None:
+        self._values.clear()
+        self._non_finite_count = 0
+
+    def reverse(self) -> None:
+        self._values.reverse()
+
+
+###########
+# Testing #
+###########
+class TestFiniteTrackingSequence(unittest.TestCase):
+    def assert_count_matches_scan(self, values: FiniteTrackingSequence) -> None:
+        self.assertEqual(values.all_finite(), fixed_sequence_values_are_finite(values))
+        self.assertEqual(
+            values.non_finite_count,
+            sum(not math.isfinite(value) for value in values),
+        )
+
+    def test_empty_sequence(self) -> None:
+        values: FiniteTrackingSequence = FiniteTrackingSequence()
+        self.assertTrue(values.all_finite())
+        self.assertEqual(len(values), 0)
+
+    def test_initial_values(self) -> None:
+        values: FiniteTrackingSequence = FiniteTrackingSequence(
+            [1.0, math.inf, float("nan"), -2.0]
+        )
+        self.assertEqual(values.non_finite_count, 2)
+        self.assertFalse(values.all_finite())
+
+    def test_append_and_extend(self) -> None:
+        values: FiniteTrackingSequence = FiniteTrackingSequence([1.0])
+        values.append(-math.inf)
+        self.assert_count_matches_scan(values)
+        values.extend(iter([2.0, math.nan, 3.0]))
+        self.assertEqual(values.non_finite_count, 2)
+        values += [math.inf]
+        self.assertEqual(values.non_finite_count, 3)
+        self.assert_count_matches_scan(values)
+
+    def test_insert(self) -> None:
+        values: FiniteTrackingSequence = FiniteTrackingSequence([1.0, 2.0])
+        values.insert(1, math.nan)
+        self.assertEqual(values, [1.0, values[1], 2.0])
+        self.assert_count_matches_scan(values)
+
+    def test_set_item(self) -> None:
+        values: FiniteTrackingSequence = FiniteTrackingSequence([1.0, 2.0, 3.0])
+        values[1] = math.inf
+        self.assertFalse(values.all_finite())
+        values[-2] = 4.0
+        self.assertTrue(values.all_finite())
+        self.assertEqual(values, [1.0, 4.0, 3.0])
+        with self.assertRaises(IndexError):
+            values[3] = math.nan
+        self.assertTrue(values.all_finite())
+
+    def test_set_slice(self) -> None:
+        values: FiniteTrackingSequence = FiniteTrackingSequence(
+            [1.0, math.inf, 2.0, math.nan]
+        )
+        values[1:3] = [5.0, 6.0, -math.inf]
+        self.assert_count_matches_scan(values)
+        values[::2] = [math.nan, math.nan, math.nan]
+        self.assert_count_matches_scan(values)
+        with self.assertRaises(ValueError):
+            values[::2] = [1.0]
+        self.assert_count_matches_scan(values)
+
+    def test_delete(self) -> None:
+        values: FiniteTrackingSequence = FiniteTrackingSequence(
+            [math.inf, 1.0, math.nan, 2.0, -math.inf]
+        )
+        del values[0]
+        self.assertEqual(values.non_finite_count, 2)
+        del values[1:]
+        self.assertTrue(values.all_finite())
+        self.assertEqual(values, [1.0])
+
+    def test_pop_remove_and_clear(self) -> None:
+        values: FiniteTrackingSequence = FiniteTrackingSequence(
+            [math.inf, 1.0, -math.inf]
+        )
+        self.assertEqual(values.pop(), -math.inf)
+        values.remove(math.inf)
+        self.assertTrue(values.all_finite())
+        values.append(math.nan)
+        values.clear()
+        self.assertTrue(values.all_finite())
+        self.assertEqual(len(values), 0)
+
+    def test_slice_is_tracked(self) -> None:
+        values: FiniteTrackingSequence = FiniteTrackingSequence([1.0, math.inf, 2.0])
+        self.assertTrue(values[::2].all_finite())
+        self.assertFalse(values[1:].all_finite())
+
+    def test_works_with_fixed_validation(self) -> None:
+        self.assertTrue(
+            fixed_sequence_values_are_finite(FiniteTrackingSequence([1.0, 2.0]))
+        )
+        self.assertFalse(
+            fixed_sequence_values_are_finite(FiniteTrackingSequence([1.0, math.nan]))
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,174 @@
+"""
+This is a streaming version of the buffer validation code for flat binary
+files of native float64 values that are too large to load into memory.
+
+The file is memory-mapped and scanned in fixed-size chunks with
+`buffer_first_non_finite_index`. Pages of each chunk are released once
+it has been scanned, so resident memory stays bounded by the chunk size
+rather than growing with the file. The scan stops at the first infinity,
+negative infinity, or NaN and reports where it is in the file.
+
+`python3 ./mmap_validation_code.py` will run unit tests.
+"""
+
+from array import array
+from dataclasses import dataclass
+import math
+import mmap
+import os
+import struct
+import tempfile
+import unittest
+
+from buffer_validation_code import FLOAT64_SIZE, buffer_first_non_finite_index
+
+# Bytes scanned per chunk, a multiple of the page size so chunks can be released
+DEFAULT_CHUNK_BYTES: int = 1 << 22
+
+
+@dataclass(frozen=True)
+class NonFiniteValue:
+    # Position of the value counted in float64 elements from the start of the file
+    index: int
+    # Position of the value counted in bytes from the start of the file
+    byte_offset: int
+    value: float
+
+
+def file_first_non_finite_value(
+    path: str | os.PathLike[str], chunk_bytes: int = DEFAULT_CHUNK_BYTES
+) -> NonFiniteValue | None:
+    """
+    Given the path to a file of packed native float64 values, returns the
+    first value that is infinity, negative infinity, or not a number.
+
+    Returns None if all values are finite.
+
+    Raises ValueError if the file is not a whole number of float64 values
+    or if `chunk_bytes` is not a positive multiple of the page size.
+    """
+    if chunk_bytes <= 0 or chunk_bytes % mmap.PAGESIZE:
+        raise ValueError(
+            f"chunk_bytes must be a positive multiple of {mmap.PAGESIZE}, got {chunk_bytes}"
+        )
+
+    with open(path, "rb") as file:
+        file_size: int = os.fstat(file.fileno()).st_size
+        if file_size % FLOAT64_SIZE:
+            raise ValueError(
+                f"File of {file_size} bytes is not a whole number of float64 values"
+            )
+        if file_size == 0:
+            # mmap cannot map an empty file, and there is nothing to check
+            return None
+
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            if hasattr(mmap, "MADV_SEQUENTIAL"):
+                mapped.madvise(mmap.MADV_SEQUENTIAL)
+
+            for chunk_start in range(0, file_size, chunk_bytes):
+                chunk_stop: int = min(chunk_start + chunk_bytes, file_size)
+                with memoryview(mapped)[chunk_start:chunk_stop] as chunk:
+                    chunk_index: int = buffer_first_non_finite_index(chunk)
+
+                if chunk_index != -1:
+                    byte_offset: int = chunk_start + chunk_index * FLOAT64_SIZE
+                    return NonFiniteValue(
+                        index=byte_offset // FLOAT64_SIZE,
+                        byte_offset=byte_offset,
+                        value=struct.unpack_from("=d", mapped, byte_offset)[0],
+                    )
+
+                # Drop the scanned pages so they do not count towards resident memory
+                if hasattr(mmap, "MADV_DONTNEED"):
+                    mapped.madvise(
+                        mmap.MADV_DONTNEED, chunk_start, chunk_stop - chunk_start
+                    )
+    return None
+
+
+def file_values_are_finite(
+    path: str | os.PathLike[str], chunk_bytes: int = DEFAULT_CHUNK_BYTES
+) -> bool:
+    """
+    Given the path to a file of packed native float64 values checks that none
+    of the values are infinity, negative infinity, or not a number (therefore finite).
+
+    Returns True if all values are finite, otherwise False.
+    """
+    return file_first_non_finite_value(path, chunk_bytes) is None
+
+
+###########
+# Testing #
+###########
+class TestFileFirstNonFiniteValue(unittest.TestCase):
+    def setUp(self) -> None:
+        self.temp_dir: tempfile.TemporaryDirectory[str] = tempfile.TemporaryDirectory()
+        self.path: str = os.path.join(self.temp_dir.name, "values.f64")
+
+    def tearDown(self) -> None:
+        self.temp_dir.cleanup()
+
+    def write_values(self, values: array[float]) -> None:
+        with open(self.path, "wb") as file:
+            values.tofile(file)
+
+    def test_empty_file(self) -> None:
+        self.write_values(array("d"))
+        self.assertIsNone(file_first_non_finite_value(self.path))
+        self.assertTrue(file_values_are_finite(self.path))
+
+    def test_valid_file(self) -> None:
+        self.write_values(array("d", [1.0, 0.0, -42.0, 47102378931.0]))
+        self.assertIsNone(file_first_non_finite_value(self.path))
+        self.assertTrue(file_values_are_finite(self.path))
+
+    def test_has_infinity(self) -> None:
+        self.write_values(array("d", [1.0, math.inf, -2.0]))
+        self.assertEqual(
+            file_first_non_finite_value(self.path), NonFiniteValue(1, 8, math.inf)
+        )
+        self.assertFalse(file_values_are_finite(self.path))
+
+    def test_has_negative_infinity(self) -> None:
+        self.write_values(array("d", [1.0, -2.0, -math.inf]))
+        self.assertEqual(
+            file_first_non_finite_value(self.path), NonFiniteValue(2, 16, -math.inf)
+        )
+
+    def test_has_nan(self) -> None:
+        self.write_values(array("d", [float("nan"), 1.0, -2.0]))
+        result: NonFiniteValue | None = file_first_non_finite_value(self.path)
+        assert result is not None
+        self.assertEqual((result.index, result.byte_offset), (0, 0))
+        self.assertTrue(math.isnan(result.value))
+
+    def test_first_offender_in_later_chunk(self) -> None:
+        values_per_chunk: int = mmap.PAGESIZE // FLOAT64_SIZE
+        values: array[float] = array("d", [1.0]) * (values_per_chunk * 3 + 5)
+        values[values_per_chunk * 2 + 3] = math.nan
+        values[values_per_chunk * 3 + 1] = math.inf
+        self.write_values(values)
+
+        result: NonFiniteValue | None = file_first_non_finite_value(
+            self.path, chunk_bytes=mmap.PAGESIZE
+        )
+        assert result is not None
+        self.assertEqual(result.index, values_per_chunk * 2 + 3)
+        self.assertEqual(result.byte_offset, mmap.PAGESIZE * 2 + 3 * FLOAT64_SIZE)
+
+    def test_partial_double_raises(self) -> None:
+        with open(self.path, "wb") as file:
+            file.write(b"\x00" * 12)
+        with self.assertRaises(ValueError):
+            file_first_non_finite_value(self.path)
+
+    def test_unaligned_chunk_raises(self) -> None:
+        self.write_values(array("d", [1.0]))
+        with self.assertRaises(ValueError):
+            file_first_non_finite_value(self.path, chunk_bytes=FLOAT64_SIZE)
+
+
+if __name__ == "__main__":
+    unittest.main()
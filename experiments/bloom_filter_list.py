@@ -0,0 +1,239 @@
+"""
+Show a `SimpleList` variant with a Bloom filter in front of `in`.
+
+When most membership checks are misses, `ContainsOnlyList` pays for a full
+scan every time. `BloomFilterList` first checks a Bloom filter sized from an
+expected number of items: if any of its k bits for the item are unset the item
+is definitely missing, so a miss costs k hash positions rather than a scan.
+Items that pass the filter are confirmed against the list, since the filter
+can report false positives.
+
+The filter is rebuilt (larger) when more items are appended than it was sized
+for, or when the false positive rate seen by recent checks drifts well above
+the target. Counts of checks, filter rejections, filter hits, and false
+positives are kept in `stats`.
+"""
+
+from collections.abc import Iterable
+from dataclasses import dataclass
+import math
+import unittest
+
+from membership_test_operations import SimpleList
+
+_MASK_64: int = (1 << 64) - 1
+
+# The observed false positive rate must exceed the target by this factor
+# over at least this many misses before the filter is rebuilt
+DRIFT_FACTOR: float = 2.0
+DRIFT_MIN_SAMPLES: int = 1_000
+
+
+def _mix_64(val: int) -> int:
+    # splitmix64 finalizer, so the two hashes below are independent enough
+    val = (val ^ (val >> 30)) * 0xBF58476D1CE4E5B9 & _MASK_64
+    val = (val ^ (val >> 27)) * 0x94D049BB133111EB & _MASK_64
+    return val ^ (val >> 31)
+
+
+class BloomFilter:
+    def __init__(self, expected_items: int, false_positive_rate: float) -> None:
+        if expected_items < 1:
+            raise ValueError(f"expected_items must be at least 1, got {expected_items}")
+        if not 0 < false_positive_rate < 1:
+            raise ValueError(
+                f"false_positive_rate must be between 0 and 1, got {false_positive_rate}"
+            )
+        # Standard sizing: m = -n ln(p) / ln(2)^2 bits and k = (m / n) ln(2) hashes
+        self.num_bits: int = max(
+            8,
+            math.ceil(
+                -expected_items * math.log(false_positive_rate) / math.log(2) ** 2
+            ),
+        )
+        self.num_hashes: int = max(
+            1, round(self.num_bits / expected_items * math.log(2))
+        )
+        self.bits: bytearray = bytearray((self.num_bits + 7) // 8)
+
+    def _positions(self, item: object) -> Iterable[int]:
+        # Double hashing: position i is h1 + i * h2, from one call to `hash`
+        mixed: int = _mix_64(hash(item) & _MASK_64)
+        first: int = mixed & 0xFFFFFFFF
+        second: int = (mixed >> 32) | 1
+        for i in range(self.num_hashes):
+            yield (first + i * second) % self.num_bits
+
+    def add(self, item: object) -> None:
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def might_contain(self, item: object) -> bool:
+        return all(
+            self.bits[position >> 3] & (1 << (position & 7))
+            for position in self._positions(item)
+        )
+
+
+@dataclass
+class BloomFilterStats:
+    # Membership checks made with `in` or `not in`
+    checks: int = 0
+    # Checks the filter answered as definitely missing, without a scan
+    filter_rejections: int = 0
+    # Checks that passed the filter and were confirmed against the list
+    filter_hits: int = 0
+    # Filter hits where the list did not actually have the item
+    false_positives: int = 0
+    rebuilds: int = 0
+
+
+class BloomFilterList[T](SimpleList[T]):
+    def __init__(
+        self, expected_items: int = 1024, false_positive_rate: float = 0.01
+    ) -> None:
+        super().__init__()
+        self.expected_items: int = expected_items
+        self.false_positive_rate: float = false_positive_rate
+        self.bloom_filter: BloomFilter = BloomFilter(
+            expected_items, false_positive_rate
+        )
+        self.stats: BloomFilterStats = BloomFilterStats()
+        # Unhashable items cannot be added to the filter, so any of them force a scan
+        self._unhashable_count: int = 0
+        # Misses and false positives since the drift was last checked
+        self._window_misses: int = 0
+        self._window_false_positives: int = 0
+
+    def _add_to_filter(self, val: T) -> None:
+        try:
+            self.bloom_filter.add(val)
+        except TypeError:
+            self._unhashable_count += 1
+
+    def append(self, val: T) -> None:
+        super().append(val)
+        self._add_to_filter(val)
+        if len(self.internal_list) > self.expected_items:
+            self.rebuild(2 * len(self.internal_list))
+
+    def rebuild(self, expected_items: int | None = None) -> None:
+        """
+        Replaces the filter with a new one sized for `expected_items`
+        (default: the current size) and adds every item to it again.
+        """
+        self.expected_items = max(expected_items or 0, len(self.internal_list), 1)
+        self.bloom_filter = BloomFilter(self.expected_items, self.false_positive_rate)
+        self._unhashable_count = 0
+        for val in self.internal_list:
+            self._add_to_filter(val)
+        self._window_misses = 0
+        self._window_false_positives = 0
+        self.stats.rebuilds += 1
+
+    def _record_miss(self, false_positive: bool) -> None:
+        self._window_misses += 1
+        self._window_false_positives += false_positive
+        if self._window_misses < DRIFT_MIN_SAMPLES:
+            return
+        observed_rate: float = self._window_false_positives / self._window_misses
+        if observed_rate > self.false_positive_rate * DRIFT_FACTOR:
+            self.rebuild(2 * self.expected_items)
+        else:
+            self._window_misses = 0
+            self._window_false_positives = 0
+
+    def __contains__(self, item: object) -> bool:
+        self.stats.checks += 1
+        try:
+            might_contain: bool = self.bloom_filter.might_contain(item)
+        except TypeError:
+            # An unhashable item is never in the filter, so scan for it
+            return item in self.internal_list
+
+        if not might_contain and self._unhashable_count == 0:
+            self.stats.filter_rejections += 1
+            self._record_miss(false_positive=False)
+            return False
+
+        found: bool = item in self.internal_list
+        if might_contain:
+            self.stats.filter_hits += 1
+            if not found:
+                self.stats.false_positives += 1
+                self._record_miss(false_positive=True)
+        return found
+
+
+class TestBloomFilterList(unittest.TestCase):
+    def setUp(self) -> None:
+        self.test_list: BloomFilterList[int] = BloomFilterList(expected_items=16)
+
+        self.item_in_list: int = 42
+        self.test_list.append(self.item_in_list)
+
+        self.item_not_in_list: int = -1
+
+    def test_in_returns_false(self) -> None:
+        self.assertFalse(self.item_not_in_list in self.test_list)
+
+    def test_in_return_true(self) -> None:
+        self.assertTrue(self.item_in_list in self.test_list)
+
+    def test_not_in_returns_false(self) -> None:
+        self.assertFalse(self.item_in_list not in self.test_list)
+
+    def test_not_in_returns_true(self) -> None:
+        self.assertTrue(self.item_not_in_list not in self.test_list)
+
+    def test_stats(self) -> None:
+        self.assertTrue(self.item_in_list in self.test_list)
+        self.assertTrue(self.item_not_in_list not in self.test_list)
+        self.assertEqual(self.test_list.stats.checks, 2)
+        self.assertEqual(self.test_list.stats.filter_hits, 1)
+        self.assertEqual(
+            self.test_list.stats.filter_rejections
+            + self.test_list.stats.false_positives,
+            1,
+        )
+
+    def test_grows_past_expected_items(self) -> None:
+        for val in range(100):
+            self.test_list.append(val)
+        self.assertGreater(self.test_list.stats.rebuilds, 0)
+        self.assertGreaterEqual(self.test_list.expected_items, 101)
+        for val in range(100):
+            self.assertTrue(val in self.test_list)
+        self.assertEqual(self.test_list.stats.false_positives, 0)
+
+    def test_most_misses_are_rejected_by_the_filter(self) -> None:
+        test_list: BloomFilterList[int] = BloomFilterList(expected_items=1000)
+        for val in range(1000):
+            test_list.append(val)
+        for val in range(-1, -1001, -1):
+            self.assertTrue(val not in test_list)
+        self.assertGreater(test_list.stats.filter_rejections, 950)
+
+    def test_drift_triggers_rebuild(self) -> None:
+        # A filter with every bit set lets every check through
+        self.test_list.bloom_filter.bits[:] = b"\xff" * len(
+            self.test_list.bloom_filter.bits
+        )
+        for val in range(DRIFT_MIN_SAMPLES):
+            self.assertTrue(-val - 1 not in self.test_list)
+        self.assertEqual(self.test_list.stats.false_positives, DRIFT_MIN_SAMPLES)
+        self.assertEqual(self.test_list.stats.rebuilds, 1)
+        self.assertTrue(self.item_in_list in self.test_list)
+
+    def test_unhashable_items(self) -> None:
+        test_list: BloomFilterList[list[int] | int] = BloomFilterList()
+        test_list.append([1, 2])
+        test_list.append(3)
+        self.assertTrue([1, 2] in test_list)
+        self.assertTrue(3 in test_list)
+        self.assertTrue([4] not in test_list)
+        self.assertTrue(5 not in test_list)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,154 @@
+"""
+Show a `SimpleList` variant where `in` and `not in` use a hash index instead
+of a linear scan like `ContainsOnlyList` does.
+
+`IndexedList` keeps a dictionary of value -> number of occurrences in sync with
+`append`, `remove`, `pop`, and item assignment, so membership of hashable items
+is O(1). Unhashable items (eg: lists) cannot go in the index, so they are
+tracked by count and `__contains__` falls back to scanning the list for them.
+"""
+
+from collections.abc import Hashable, Iterator
+import unittest
+
+from membership_test_operations import SimpleList
+
+
+def _is_hashable(val: object) -> bool:
+    # `isinstance(val, Hashable)` is not enough, eg: a tuple containing a list
+    try:
+        hash(val)
+    except TypeError:
+        return False
+    return True
+
+
+class IndexedList[T](SimpleList[T]):
+    def __init__(self) -> None:
+        super().__init__()
+        self._index: dict[Hashable, int] = {}
+        self._unhashable_count: int = 0
+
+    def _add_to_index(self, val: T) -> None:
+        if _is_hashable(val):
+            self._index[val] = self._index.get(val, 0) + 1
+        else:
+            self._unhashable_count += 1
+
+    def _remove_from_index(self, val: T) -> None:
+        if _is_hashable(val):
+            remaining: int = self._index[val] - 1
+            if remaining:
+                self._index[val] = remaining
+            else:
+                del self._index[val]
+        else:
+            self._unhashable_count -= 1
+
+    def append(self, val: T) -> None:
+        super().append(val)
+        self._add_to_index(val)
+
+    def remove(self, val: T) -> None:
+        self.pop(self.internal_list.index(val))
+
+    def pop(self, index: int = -1) -> T:
+        val: T = self.internal_list.pop(index)
+        self._remove_from_index(val)
+        return val
+
+    def __setitem__(self, index: int, val: T) -> None:
+        old_val: T = self.internal_list[index]
+        self.internal_list[index] = val
+        self._remove_from_index(old_val)
+        self._add_to_index(val)
+
+    def __getitem__(self, index: int) -> T:
+        return self.internal_list[index]
+
+    def __len__(self) -> int:
+        return len(self.internal_list)
+
+    def __iter__(self) -> Iterator[T]:
+        return iter(self.internal_list)
+
+    def __contains__(self, item: object) -> bool:
+        if not _is_hashable(item):
+            return item in self.internal_list
+        if item in self._index:
+            return True
+        # Only a scan can tell if a hashable item equals a stored unhashable one
+        return self._unhashable_count > 0 and item in self.internal_list
+
+
+class TestIndexedList(unittest.TestCase):
+    def setUp(self) -> None:
+        self.test_list: IndexedList[int] = IndexedList()
+
+        self.item_in_list: int = 42
+        self.test_list.append(self.item_in_list)
+
+        self.item_not_in_list: int = -1
+
+    def test_in_returns_false(self) -> None:
+        self.assertFalse(self.item_not_in_list in self.test_list)
+
+    def test_in_return_true(self) -> None:
+        self.assertTrue(self.item_in_list in self.test_list)
+
+    def test_not_in_returns_false(self) -> None:
+        self.assertFalse(self.item_in_list not in self.test_list)
+
+    def test_not_in_returns_true(self) -> None:
+        self.assertTrue(self.item_not_in_list not in self.test_list)
+
+    def test_remove_keeps_duplicates(self) -> None:
+        self.test_list.append(self.item_in_list)
+        self.test_list.remove(self.item_in_list)
+        self.assertTrue(self.item_in_list in self.test_list)
+        self.test_list.remove(self.item_in_list)
+        self.assertTrue(self.item_in_list not in self.test_list)
+
+    def test_remove_missing_raises(self) -> None:
+        with self.assertRaises(ValueError):
+            self.test_list.remove(self.item_not_in_list)
+
+    def test_pop(self) -> None:
+        self.assertEqual(self.test_list.pop(), self.item_in_list)
+        self.assertTrue(self.item_in_list not in self.test_list)
+
+    def test_set_item(self) -> None:
+        self.test_list[0] = self.item_not_in_list
+        self.assertTrue(self.item_in_list not in self.test_list)
+        self.assertTrue(self.item_not_in_list in self.test_list)
+        self.assertEqual(list(self.test_list), [self.item_not_in_list])
+
+
+class TestIndexedListUnhashable(unittest.TestCase):
+    def setUp(self) -> None:
+        self.test_list: IndexedList[list[int] | int] = IndexedList()
+
+        self.item_in_list: list[int] = [42]
+        self.test_list.append(self.item_in_list)
+        self.test_list.append(7)
+
+        self.item_not_in_list: list[int] = [-1]
+
+    def test_in_returns_false(self) -> None:
+        self.assertFalse(self.item_not_in_list in self.test_list)
+
+    def test_in_return_true(self) -> None:
+        # An equal but different list is still found by the scan
+        self.assertTrue([42] in self.test_list)
+        self.assertTrue(7 in self.test_list)
+
+    def test_remove_and_set_item(self) -> None:
+        self.test_list.remove([42])
+        self.assertTrue(self.item_in_list not in self.test_list)
+        self.test_list[0] = [1, 2]
+        self.assertTrue(7 not in self.test_list)
+        self.assertTrue([1, 2] in self.test_list)
+
+
+if __name__ == "__main__":
+    unittest.main()
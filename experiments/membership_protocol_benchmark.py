@@ -0,0 +1,148 @@
+"""
+Measure what `in` and `not in` cost for each way a class can support them,
+using the classes from `membership_test_operations.py`:
+1) `ContainsOnlyList`: `__contains__`, which delegates to the list's C scan
+2) `IterOnlyList`: `__iter__`, so Python walks the iterator comparing items
+3) `GetItemOnlyList`: `__getitem__`, called from Python for every index until
+   the `IndexError` sentinel is raised on a miss
+`IndexedList` from `indexed_membership_list.py` is included as a hashed baseline.
+
+For each class, list size, and position of the item (start, middle, end, or
+missing) this prints the best time of one check and the peak bytes allocated
+during it (via `tracemalloc`). It also prints the cost of raising and catching
+a single `IndexError` on its own, which every `GetItemOnlyList` miss pays.
+
+`python3 ./membership_protocol_benchmark.py` will run the benchmark.
+"""
+
+from collections.abc import Callable
+import timeit
+import tracemalloc
+import unittest
+
+from indexed_membership_list import IndexedList
+from membership_test_operations import (
+    ContainsOnlyList,
+    GetItemOnlyList,
+    IterOnlyList,
+    SimpleList,
+)
+
+# Each class supports `in` a different way, which `SimpleList` itself does not
+type MembershipList = (
+    ContainsOnlyList[int] | IterOnlyList[int] | GetItemOnlyList[int] | IndexedList[int]
+)
+
+LIST_CLASSES: tuple[type[MembershipList], ...] = (
+    ContainsOnlyList,
+    IterOnlyList,
+    GetItemOnlyList,
+    IndexedList,
+)
+
+LIST_SIZES: tuple[int, ...] = (10, 100, 1_000, 10_000)
+
+HIT_POSITIONS: tuple[str, ...] = ("start", "middle", "end", "missing")
+
+
+def build_list[L: SimpleList[int]](list_class: type[L], size: int) -> L:
+    """
+    Returns an instance of `list_class` holding 0 to size - 1.
+    """
+    test_list: L = list_class()
+    for val in range(size):
+        test_list.append(val)
+    return test_list
+
+
+def item_for_position(size: int, position: str) -> int:
+    """
+    Returns the item to look for so it is found at the named position.
+    """
+    match position:
+        case "start":
+            return 0
+        case "middle":
+            return size // 2
+        case "end":
+            return size - 1
+        case "missing":
+            return -1
+        case _:
+            raise ValueError(f"Unknown hit position {position!r}")
+
+
+def best_time(check: Callable[[], object], repeat: int = 3) -> float:
+    """
+    Returns the best time in seconds of a single call to `check`.
+    """
+    timer: timeit.Timer = timeit.Timer(check)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=repeat, number=number)) / number
+
+
+def peak_allocated_bytes(check: Callable[[], object]) -> int:
+    """
+    Returns the peak number of bytes allocated while running `check` once.
+    """
+    tracemalloc.start()
+    try:
+        baseline, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        check()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak - baseline
+
+
+def raise_index_error() -> None:
+    try:
+        raise IndexError
+    except IndexError:
+        pass
+
+
+def main() -> None:
+    print(
+        f"Raising and catching IndexError: {best_time(raise_index_error) * 1e9:.0f} ns"
+    )
+    print(
+        f"{'class':>17} {'size':>6} {'position':>8} {'in (ns)':>12}"
+        f" {'not in (ns)':>12} {'peak bytes':>11}"
+    )
+    for list_class in LIST_CLASSES:
+        for size in LIST_SIZES:
+            test_list: MembershipList = build_list(list_class, size)
+            for position in HIT_POSITIONS:
+                item: int = item_for_position(size, position)
+                in_time: float = best_time(lambda: item in test_list)
+                not_in_time: float = best_time(lambda: item not in test_list)
+                peak_bytes: int = peak_allocated_bytes(lambda: item in test_list)
+                print(
+                    f"{list_class.__name__:>17} {size:>6} {position:>8}"
+                    f" {in_time * 1e9:>12.0f} {not_in_time * 1e9:>12.0f}"
+                    f" {peak_bytes:>11}"
+                )
+
+
+class TestBenchmarkHelpers(unittest.TestCase):
+    def test_item_for_position_is_found_where_expected(self) -> None:
+        for list_class in LIST_CLASSES:
+            test_list: MembershipList = build_list(list_class, 5)
+            for position in ("start", "middle", "end"):
+                self.assertTrue(item_for_position(5, position) in test_list)
+            self.assertTrue(item_for_position(5, "missing") not in test_list)
+
+    def test_unknown_position_raises(self) -> None:
+        with self.assertRaises(ValueError):
+            item_for_position(5, "sideways")
+
+    def test_measurements_are_non_negative(self) -> None:
+        test_list: GetItemOnlyList[int] = build_list(GetItemOnlyList[int], 10)
+        self.assertGreater(best_time(lambda: -1 in test_list, repeat=1), 0)
+        self.assertGreaterEqual(peak_allocated_bytes(lambda: -1 in test_list), 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,237 @@
+"""
+Show a compact alternative to `SimpleList` for int and float elements.
+
+`SimpleList` instances each carry a `__dict__`, and its `list[T]` holds a
+pointer to a separate Python object for every element. `TypedArrayList` uses
+`__slots__` and stores the raw values in an `array.array` instead, so each
+element is 8 bytes and there is no per-instance dictionary.
+
+`in` does not box each stored value to compare it. The item is packed to the
+same bytes as a stored value and the array's buffer is searched for them
+directly. The class also exposes the buffer protocol itself, so it can be
+passed to anything accepting a buffer (eg: `memoryview`).
+
+Running this file prints a memory comparison against `SimpleList`.
+"""
+
+from array import array
+from collections.abc import Buffer, Iterable, Iterator
+import math
+import re
+import struct
+import tracemalloc
+import unittest
+
+from membership_test_operations import SimpleList
+
+# Signed 64-bit ints and float64 values, both 8 bytes per element
+TYPECODES: dict[type, str] = {int: "q", float: "d"}
+
+
+class TypedArrayList[T: (int, float)]:
+    __slots__ = ("element_type", "internal_array")
+
+    def __init__(self, element_type: type[T], values: Iterable[T] = ()) -> None:
+        typecode: str | None = TYPECODES.get(element_type)
+        if typecode is None:
+            raise TypeError(f"Element type must be int or float, not {element_type}")
+        self.element_type: type[T] = element_type
+        self.internal_array: array[T] = array(typecode, values)
+
+    def append(self, val: T) -> None:
+        self.internal_array.append(val)
+
+    def __len__(self) -> int:
+        return len(self.internal_array)
+
+    def __iter__(self) -> Iterator[T]:
+        return iter(self.internal_array)
+
+    def __buffer__(self, flags: int) -> memoryview:
+        return memoryview(self.internal_array)
+
+    def _packed_patterns(self, item: object) -> list[bytes]:
+        """
+        Returns the byte patterns a stored value equal to `item` could have,
+        which is empty if no storable value can equal it.
+        """
+        if not isinstance(item, (int, float)):
+            return []
+        if self.internal_array.typecode == "d":
+            try:
+                as_float: float = float(item)
+            except OverflowError:
+                # An int too large for a float64 cannot equal any stored value
+                return []
+            if as_float != item:
+                # NaN is never equal to anything, including a stored NaN, and
+                # neither is an int that a float64 cannot hold exactly
+                return []
+            if as_float == 0:
+                # 0.0 and -0.0 are equal but have different bytes
+                return [struct.pack("=d", 0.0), struct.pack("=d", -0.0)]
+            return [struct.pack("=d", as_float)]
+        if isinstance(item, float) and not item.is_integer():
+            return []
+        try:
+            return [struct.pack("=q", int(item))]
+        except (OverflowError, struct.error):
+            return []
+
+    def __contains__(self, item: object) -> bool:
+        patterns: list[bytes] = self._packed_patterns(item)
+        if not patterns:
+            return False
+        pattern: re.Pattern[bytes] = re.compile(
+            b"|".join(re.escape(packed) for packed in patterns)
+        )
+        itemsize: int = self.internal_array.itemsize
+        # `re` searches the array's buffer in place, without copying or boxing
+        haystack: Buffer = self.internal_array
+        match: re.Match[bytes] | None = pattern.search(haystack)
+        while match is not None:
+            # A match straddling two values is not a real match
+            if match.start() % itemsize == 0:
+                return True
+            match = pattern.search(haystack, match.start() + 1)
+        return False
+
+
+########
+# Main #
+########
+def traced_bytes(build: Iterable[object]) -> int:
+    """
+    Returns the bytes still allocated after consuming `build`, while its
+    results are kept alive.
+    """
+    tracemalloc.start()
+    try:
+        baseline, _ = tracemalloc.get_traced_memory()
+        kept: list[object] = list(build)
+        current, _ = tracemalloc.get_traced_memory()
+        del kept
+    finally:
+        tracemalloc.stop()
+    return current - baseline
+
+
+def build_simple_list(values: range) -> SimpleList[float]:
+    simple_list: SimpleList[float] = SimpleList()
+    for val in values:
+        simple_list.append(val / 3)
+    return simple_list
+
+
+def build_typed_array_list(values: range) -> TypedArrayList[float]:
+    typed_list: TypedArrayList[float] = TypedArrayList(float)
+    for val in values:
+        typed_list.append(val / 3)
+    return typed_list
+
+
+def main() -> None:
+    num_containers: int = 100_000
+    print(f"Bytes per container for {num_containers} containers of floats")
+    print(f"{'elements':>9} {'SimpleList':>11} {'TypedArrayList':>15}")
+    for num_elements in (0, 1, 4, 16, 256):
+        simple_bytes: int = traced_bytes(
+            build_simple_list(range(num_elements)) for _ in range(num_containers)
+        )
+        typed_bytes: int = traced_bytes(
+            build_typed_array_list(range(num_elements)) for _ in range(num_containers)
+        )
+        print(
+            f"{num_elements:>9} {simple_bytes / num_containers:>11.1f}"
+            f" {typed_bytes / num_containers:>15.1f}"
+        )
+
+
+class TestTypedArrayListInt(unittest.TestCase):
+    def setUp(self) -> None:
+        self.test_list: TypedArrayList[int] = TypedArrayList(int)
+
+        self.item_in_list: int = 42
+        self.test_list.append(self.item_in_list)
+
+        self.item_not_in_list: int = -1
+
+    def test_in_returns_false(self) -> None:
+        self.assertFalse(self.item_not_in_list in self.test_list)
+
+    def test_in_return_true(self) -> None:
+        self.assertTrue(self.item_in_list in self.test_list)
+
+    def test_not_in_returns_false(self) -> None:
+        self.assertFalse(self.item_in_list not in self.test_list)
+
+    def test_not_in_returns_true(self) -> None:
+        self.assertTrue(self.item_not_in_list not in self.test_list)
+
+    def test_matches_array_semantics(self) -> None:
+        self.test_list.append(1)
+        for item in (42.0, 42.5, 1, True, False, 2**70, 2**1100, "42", None):
+            self.assertEqual(
+                item in self.test_list,
+                item in self.test_list.internal_array,
+                msg=repr(item),
+            )
+
+    def test_misaligned_bytes_do_not_match(self) -> None:
+        # 256 shares its low bytes with the boundary between 1 and 0 below
+        test_list: TypedArrayList[int] = TypedArrayList(int, [1 << 56, 0])
+        self.assertFalse(256 in test_list)
+        self.assertFalse(1 in test_list)
+
+    def test_iteration_and_length(self) -> None:
+        self.test_list.append(7)
+        self.assertEqual(list(self.test_list), [42, 7])
+        self.assertEqual(len(self.test_list), 2)
+
+    def test_has_no_instance_dict(self) -> None:
+        self.assertFalse(hasattr(self.test_list, "__dict__"))
+
+
+class TestTypedArrayListFloat(unittest.TestCase):
+    def setUp(self) -> None:
+        self.test_list: TypedArrayList[float] = TypedArrayList(
+            float, [1.5, -0.0, math.inf, math.nan]
+        )
+
+    def test_in(self) -> None:
+        self.assertTrue(1.5 in self.test_list)
+        self.assertTrue(3 / 2 in self.test_list)
+        self.assertTrue(math.inf in self.test_list)
+        self.assertFalse(2.5 in self.test_list)
+
+    def test_signed_zero(self) -> None:
+        self.assertTrue(0.0 in self.test_list)
+        self.assertTrue(0 in self.test_list)
+
+    def test_matches_array_semantics(self) -> None:
+        self.test_list.append(2.0**53)
+        for item in (1.5, 1, 0, True, 2**53, 2**53 + 1, 2**1100, -(2**1100), "1.5"):
+            self.assertEqual(
+                item in self.test_list,
+                item in self.test_list.internal_array,
+                msg=repr(item),
+            )
+
+    def test_nan_is_never_found(self) -> None:
+        # Same as `math.nan in array("d", [math.nan])`
+        self.assertFalse(math.nan in self.test_list)
+
+    def test_buffer_protocol(self) -> None:
+        view: memoryview = memoryview(self.test_list)
+        self.assertEqual(view.format, "d")
+        self.assertEqual(view[0], 1.5)
+
+    def test_invalid_element_type_raises(self) -> None:
+        with self.assertRaises(TypeError):
+            TypedArrayList(str)  # type: ignore
+
+
+if __name__ == "__main__":
+    main()
+
+    unittest.main()
@@ -0,0 +1,303 @@
+"""
+This is an asyncio version of `store_record_in_db_if_new` that does not block
+the event loop, and that coalesces concurrent calls into batches.
+
+Each call to `AsyncRecordWriter.store_record_in_db_if_new` puts its row on a
+queue and waits. A background task collects queued rows until either
+`max_batch_size` rows are waiting or `max_delay` seconds have passed since the
+first one, then dedupes and inserts the whole batch at once with
+`RecordStore.store_records_if_new` in a worker thread. Each caller then gets
+back whether its own row was inserted. If the insert fails, every caller in
+the batch gets the error and none of its rows are kept, so they can retry.
+
+The current queue depth and flush timings are available in `stats`.
+"""
+
+import asyncio
+from collections.abc import Iterable, Sequence
+from dataclasses import dataclass
+import os
+import tempfile
+import time
+from types import TracebackType
+import unittest
+
+from failing_sink import FailingSink
+from frozen_dataclass import FrozenDBRecord
+from record_sink import RecordSink, SQLiteRecordSink
+from record_store import BatchInsertResult, RecordStore
+
+DEFAULT_MAX_BATCH_SIZE: int = 1_000
+DEFAULT_MAX_DELAY: float = 0.005
+
+
+@dataclass
+class AsyncWriterStats:
+    # Rows waiting in the queue, and the most that have waited at once
+    queue_depth: int = 0
+    max_queue_depth: int = 0
+    flushes: int = 0
+    rows_flushed: int = 0
+    # Seconds spent deduping and inserting a batch
+    last_flush_seconds: float = 0.0
+    max_flush_seconds: float = 0.0
+    total_flush_seconds: float = 0.0
+    # Seconds from the first row of a batch being queued to its results being set
+    last_batch_latency_seconds: float = 0.0
+    max_batch_latency_seconds: float = 0.0
+
+
+class AsyncRecordWriter:
+    def __init__(
+        self,
+        current_rows: Iterable[FrozenDBRecord] = (),
+        sink: RecordSink | None = None,
+        max_batch_size: int = DEFAULT_MAX_BATCH_SIZE,
+        max_delay: float = DEFAULT_MAX_DELAY,
+    ) -> None:
+        if max_batch_size < 1:
+            raise ValueError(f"max_batch_size must be at least 1, got {max_batch_size}")
+        self.store: RecordStore = (
+            current_rows
+            if isinstance(current_rows, RecordStore)
+            else RecordStore(current_rows, sink)
+        )
+        self.max_batch_size: int = max_batch_size
+        self.max_delay: float = max_delay
+        self.stats: AsyncWriterStats = AsyncWriterStats()
+        self._queue: asyncio.Queue[
+            tuple[FrozenDBRecord, asyncio.Future[bool], float]
+        ] = asyncio.Queue()
+        self._task: asyncio.Task[None] | None = None
+
+    async def __aenter__(self) -> "AsyncRecordWriter":
+        return self
+
+    async def __aexit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_value: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        await self.close()
+
+    async def store_record_in_db_if_new(self, row: FrozenDBRecord) -> bool:
+        """
+        Tests if the input row is already present, or earlier in the same batch.
+
+        If row is already present, return False, indicated no changes to the DB.
+
+        If row is not present, add to the database and return True.
+        """
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+        result: asyncio.Future[bool] = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((row, result, time.perf_counter()))
+        self._update_queue_depth()
+        return await result
+
+    async def close(self) -> None:
+        """
+        Flushes any queued rows and stops the background task.
+        """
+        if self._task is None:
+            return
+        await self._queue.join()
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def _update_queue_depth(self) -> None:
+        self.stats.queue_depth = self._queue.qsize()
+        self.stats.max_queue_depth = max(
+            self.stats.max_queue_depth, self.stats.queue_depth
+        )
+
+    async def _next_batch(
+        self,
+    ) -> list[tuple[FrozenDBRecord, asyncio.Future[bool], float]]:
+        batch: list[tuple[FrozenDBRecord, asyncio.Future[bool], float]] = [
+            await self._queue.get()
+        ]
+        deadline: float = asyncio.get_running_loop().time() + self.max_delay
+        while len(batch) < self.max_batch_size:
+            if self._queue.empty():
+                remaining: float = deadline - asyncio.get_running_loop().time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                except TimeoutError:
+                    break
+            else:
+                batch.append(self._queue.get_nowait())
+        self._update_queue_depth()
+        return batch
+
+    async def _run(self) -> None:
+        while True:
+            batch: list[tuple[FrozenDBRecord, asyncio.Future[bool], float]] = (
+                await self._next_batch()
+            )
+            flush_start: float = time.perf_counter()
+            try:
+                # The insert may block on the database, so keep it off the event loop
+                result: BatchInsertResult = await asyncio.to_thread(
+                    self.store.store_records_if_new, [row for row, _, _ in batch]
+                )
+            except Exception as error:
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(error)
+            else:
+                for index, (_, future, _) in enumerate(batch):
+                    if not future.done():
+                        future.set_result(result[index])
+            finally:
+                self._record_flush(batch, flush_start)
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _record_flush(
+        self,
+        batch: list[tuple[FrozenDBRecord, asyncio.Future[bool], float]],
+        flush_start: float,
+    ) -> None:
+        flush_end: float = time.perf_counter()
+        flush_seconds: float = flush_end - flush_start
+        batch_latency: float = flush_end - min(queued for _, _, queued in batch)
+        self.stats.flushes += 1
+        self.stats.rows_flushed += len(batch)
+        self.stats.last_flush_seconds = flush_seconds
+        self.stats.max_flush_seconds = max(self.stats.max_flush_seconds, flush_seconds)
+        self.stats.total_flush_seconds += flush_seconds
+        self.stats.last_batch_latency_seconds = batch_latency
+        self.stats.max_batch_latency_seconds = max(
+            self.stats.max_batch_latency_seconds, batch_latency
+        )
+
+
+###########
+# Testing #
+###########
+class RecordingSink:
+    def __init__(self) -> None:
+        self.batches: list[list[FrozenDBRecord]] = []
+
+    def insert_rows_if_new(self, rows: Sequence[FrozenDBRecord]) -> list[bool]:
+        self.batches.append(list(rows))
+        return [True] * len(rows)
+
+
+class TestAsyncRecordWriter(unittest.IsolatedAsyncioTestCase):
+    async def test_single_call(self) -> None:
+        async with AsyncRecordWriter([FrozenDBRecord("Ford Prefect", 200)]) as writer:
+            self.assertTrue(
+                await writer.store_record_in_db_if_new(
+                    FrozenDBRecord("Arthur Dent", 35)
+                )
+            )
+            self.assertFalse(
+                await writer.store_record_in_db_if_new(
+                    FrozenDBRecord("Ford Prefect", 200)
+                )
+            )
+
+    async def test_concurrent_calls_are_coalesced(self) -> None:
+        sink: RecordingSink = RecordingSink()
+        rows: list[FrozenDBRecord] = [
+            FrozenDBRecord("Arthur Dent", 35),
+            FrozenDBRecord("Trillian", 30),
+            FrozenDBRecord("Arthur Dent", 35),
+            FrozenDBRecord("Ford Prefect", 200),
+        ]
+        async with AsyncRecordWriter(
+            [FrozenDBRecord("Ford Prefect", 200)], sink=sink, max_delay=0.05
+        ) as writer:
+            results: list[bool] = await asyncio.gather(
+                *(writer.store_record_in_db_if_new(row) for row in rows)
+            )
+        self.assertEqual(results, [True, True, False, False])
+        self.assertEqual(
+            sink.batches,
+            [[FrozenDBRecord("Arthur Dent", 35), FrozenDBRecord("Trillian", 30)]],
+        )
+        self.assertEqual(writer.stats.flushes, 1)
+        self.assertEqual(writer.stats.rows_flushed, 4)
+        self.assertEqual(writer.stats.max_queue_depth, 4)
+        self.assertEqual(writer.stats.queue_depth, 0)
+
+    async def test_max_batch_size(self) -> None:
+        sink: RecordingSink = RecordingSink()
+        async with AsyncRecordWriter(
+            sink=sink, max_batch_size=3, max_delay=0.05
+        ) as writer:
+            results: list[bool] = await asyncio.gather(
+                *(
+                    writer.store_record_in_db_if_new(FrozenDBRecord("Marvin", age))
+                    for age in range(7)
+                )
+            )
+        self.assertTrue(all(results))
+        self.assertEqual([len(batch) for batch in sink.batches], [3, 3, 1])
+        self.assertGreater(writer.stats.max_batch_latency_seconds, 0)
+
+    async def test_record_store_is_used_directly(self) -> None:
+        store: RecordStore = RecordStore()
+        async with AsyncRecordWriter(store) as writer:
+            await writer.store_record_in_db_if_new(FrozenDBRecord("Arthur Dent", 35))
+        self.assertTrue(FrozenDBRecord("Arthur Dent", 35) in store)
+
+    async def test_insert_error_reaches_every_caller(self) -> None:
+        sink: FailingSink = FailingSink(failures=1)
+        rows: list[FrozenDBRecord] = [
+            FrozenDBRecord("Arthur Dent", 35),
+            FrozenDBRecord("Trillian", 30),
+        ]
+        async with AsyncRecordWriter(sink=sink, max_delay=0.05) as writer:
+            results: list[bool | BaseException] = await asyncio.gather(
+                *(writer.store_record_in_db_if_new(row) for row in rows),
+                return_exceptions=True,
+            )
+            self.assertTrue(all(isinstance(result, RuntimeError) for result in results))
+            self.assertEqual(len(writer.store), 0)
+
+            # The failed rows were not kept, so retrying inserts them
+            self.assertEqual(
+                await asyncio.gather(
+                    *(writer.store_record_in_db_if_new(row) for row in rows)
+                ),
+                [True, True],
+            )
+        self.assertEqual(sink.rows, rows)
+
+    async def test_rows_the_database_already_has(self) -> None:
+        temp_dir: tempfile.TemporaryDirectory[str] = tempfile.TemporaryDirectory()
+        self.addCleanup(temp_dir.cleanup)
+        sink: SQLiteRecordSink = SQLiteRecordSink(
+            os.path.join(temp_dir.name, "records.db")
+        )
+        self.addCleanup(sink.close)
+        sink.insert_if_new(FrozenDBRecord("Arthur Dent", 35))
+        async with AsyncRecordWriter(sink=sink, max_delay=0.05) as writer:
+            # Each caller gets what the database reported for its own row
+            self.assertEqual(
+                await asyncio.gather(
+                    writer.store_record_in_db_if_new(FrozenDBRecord("Arthur Dent", 35)),
+                    writer.store_record_in_db_if_new(FrozenDBRecord("Trillian", 30)),
+                ),
+                [False, True],
+            )
+            self.assertFalse(
+                await writer.store_record_in_db_if_new(
+                    FrozenDBRecord("Arthur Dent", 35)
+                )
+            )
+        self.assertEqual(len(sink), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
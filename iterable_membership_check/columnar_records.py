@@ -0,0 +1,265 @@
+"""
+This is a memory-compact way of keeping millions of rows for the
+`row in current_rows` check.
+
+A list of `FrozenDBRecord` instances pays for an object per row, its
+attributes, and a separate `str` for every name, even when most names repeat.
+`ColumnarRecordTable` instead stores the rows as columns:
+- Each distinct name is stored once, and rows hold its index (dictionary encoding)
+- Name indices and ages are stored in `array('l')` columns, 8 bytes each per row
+- A hash index of row positions, also an array, makes `row in table` O(1)
+
+`FrozenDBRecord` instances are only created when rows are read back, one at a
+time, by iterating or indexing the table.
+
+Running this file prints the bytes per row of each representation.
+"""
+
+from array import array
+from collections.abc import Callable, Iterable, Iterator
+import sys
+import time
+import tracemalloc
+import unittest
+
+from frozen_dataclass import FrozenDBRecord, store_record_in_db_if_new
+from original_function import DBRecord
+
+_EMPTY_SLOT: int = 0
+_MIN_SLOTS: int = 8
+
+
+class ColumnarRecordTable:
+    def __init__(self, rows: Iterable[FrozenDBRecord] = ()) -> None:
+        self.names: list[str] = []
+        self._name_codes: dict[str, int] = {}
+        self.name_codes: array[int] = array("l")
+        self.ages: array[int] = array("l")
+        # Open addressing: each slot holds a row position + 1, or 0 if empty
+        self._slots: array[int] = array("q", bytes(8 * _MIN_SLOTS))
+        for row in rows:
+            self.add(row)
+
+    def _find_slot(self, name_code: int, age: int) -> tuple[int, bool]:
+        """
+        Returns the slot holding the row, or the empty slot where it would go,
+        and whether the row was found.
+        """
+        mask: int = len(self._slots) - 1
+        slot: int = hash((name_code, age)) & mask
+        while (entry := self._slots[slot]) != _EMPTY_SLOT:
+            if self.name_codes[entry - 1] == name_code and self.ages[entry - 1] == age:
+                return slot, True
+            slot = (slot + 1) & mask
+        return slot, False
+
+    def _grow(self) -> None:
+        self._slots = array("q", bytes(16 * len(self._slots)))
+        mask: int = len(self._slots) - 1
+        for index, (name_code, age) in enumerate(zip(self.name_codes, self.ages)):
+            slot: int = hash((name_code, age)) & mask
+            while self._slots[slot] != _EMPTY_SLOT:
+                slot = (slot + 1) & mask
+            self._slots[slot] = index + 1
+
+    def add(self, row: FrozenDBRecord) -> bool:
+        """
+        Adds the row unless the table already has it. Returns True if it was added.
+        """
+        # A new name gets the next code, which no stored row can match
+        name_code: int = self._name_codes.get(row.name, len(self.names))
+        slot, found = self._find_slot(name_code, row.age)
+        if found:
+            return False
+        # Appending the age first means an age that does not fit changes nothing
+        self.ages.append(row.age)
+        self.name_codes.append(name_code)
+        if name_code == len(self.names):
+            self.names.append(row.name)
+            self._name_codes[row.name] = name_code
+
+        # Keep the load factor below 2/3 so probe sequences stay short
+        if 3 * len(self.ages) > 2 * len(self._slots):
+            self._grow()
+        else:
+            self._slots[slot] = len(self.ages)
+        return True
+
+    def __contains__(self, row: object) -> bool:
+        if not isinstance(row, FrozenDBRecord):
+            return False
+        name_code: int | None = self._name_codes.get(row.name)
+        if name_code is None:
+            return False
+        try:
+            return self._find_slot(name_code, row.age)[1]
+        except TypeError:
+            # An age that is not an int cannot equal a stored one
+            return False
+
+    def __len__(self) -> int:
+        return len(self.ages)
+
+    def __getitem__(self, index: int) -> FrozenDBRecord:
+        return FrozenDBRecord(self.names[self.name_codes[index]], self.ages[index])
+
+    def __iter__(self) -> Iterator[FrozenDBRecord]:
+        names: list[str] = self.names
+        for name_code, age in zip(self.name_codes, self.ages):
+            yield FrozenDBRecord(names[name_code], age)
+
+    @property
+    def nbytes(self) -> int:
+        """
+        Returns the bytes used by the columns, the index, and the distinct names.
+        """
+        return (
+            self.name_codes.itemsize * len(self.name_codes)
+            + self.ages.itemsize * len(self.ages)
+            + self._slots.itemsize * len(self._slots)
+            + sys.getsizeof(self.names)
+            + sys.getsizeof(self._name_codes)
+            + sum(sys.getsizeof(name) for name in self.names)
+        )
+
+
+########
+# Main #
+########
+def _row_values(num_rows: int, num_ages: int) -> Iterator[tuple[str, int]]:
+    for index in range(num_rows):
+        # Every row is distinct, and each name string is built per row, as rows
+        # read from a database would be
+        yield f"Person {index // num_ages}", index % num_ages
+
+
+def _traced_bytes_per_row(build: Callable[[], object], num_rows: int) -> float:
+    tracemalloc.start()
+    built: object = build()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del built
+    return size / num_rows
+
+
+def main() -> None:
+    num_rows: int = 10**6
+    num_ages: int = 100
+
+    representations: dict[str, Callable[[], object]] = {
+        "list[DBRecord]": lambda: [
+            DBRecord(name, age) for name, age in _row_values(num_rows, num_ages)
+        ],
+        "list[FrozenDBRecord]": lambda: [
+            FrozenDBRecord(name, age) for name, age in _row_values(num_rows, num_ages)
+        ],
+        "set[FrozenDBRecord]": lambda: {
+            FrozenDBRecord(name, age) for name, age in _row_values(num_rows, num_ages)
+        },
+        "ColumnarRecordTable": lambda: ColumnarRecordTable(
+            FrozenDBRecord(name, age) for name, age in _row_values(num_rows, num_ages)
+        ),
+    }
+
+    print(f"{num_rows} rows with {num_rows // num_ages} distinct names")
+    for label, build in representations.items():
+        print(f"{label:>22}: {_traced_bytes_per_row(build, num_rows):6.1f} bytes/row")
+
+    table: ColumnarRecordTable = ColumnarRecordTable(
+        FrozenDBRecord(name, age) for name, age in _row_values(num_rows, num_ages)
+    )
+    print(
+        f"{'ColumnarRecordTable':>22}: {table.nbytes / len(table):6.1f} bytes/row (nbytes)"
+    )
+    found: int = 0
+    start: float = time.perf_counter()
+    for age in range(100):
+        found += FrozenDBRecord("Person 0", age) in table
+        found += FrozenDBRecord("Nobody", age) in table
+    print(f"200 membership checks: {time.perf_counter() - start:.6f}s ({found} found)")
+
+
+###########
+# Testing #
+###########
+class TestColumnarRecordTable(unittest.TestCase):
+    def setUp(self) -> None:
+        self.table: ColumnarRecordTable = ColumnarRecordTable(
+            [
+                FrozenDBRecord("Arthur Dent", 35),
+                FrozenDBRecord("Ford Prefect", 200),
+                FrozenDBRecord("Arthur Dent", 30),
+            ]
+        )
+
+    def test_in(self) -> None:
+        self.assertTrue(FrozenDBRecord("Arthur Dent", 35) in self.table)
+        self.assertTrue(FrozenDBRecord("Ford Prefect", 200) in self.table)
+        self.assertFalse(FrozenDBRecord("Arthur Dent", 200) in self.table)
+        self.assertFalse(FrozenDBRecord("Trillian", 30) in self.table)
+
+    def test_other_types_are_not_in(self) -> None:
+        self.assertFalse(DBRecord("Arthur Dent", 35) in self.table)
+        self.assertFalse("Arthur Dent" in self.table)
+        self.assertFalse(FrozenDBRecord("Arthur Dent", "35") in self.table)  # type: ignore
+
+    def test_names_are_stored_once(self) -> None:
+        self.assertEqual(self.table.names, ["Arthur Dent", "Ford Prefect"])
+        self.assertEqual(list(self.table.name_codes), [0, 1, 0])
+        self.assertEqual(list(self.table.ages), [35, 200, 30])
+
+    def test_add_skips_duplicates(self) -> None:
+        self.assertFalse(self.table.add(FrozenDBRecord("Arthur Dent", 35)))
+        self.assertTrue(self.table.add(FrozenDBRecord("Trillian", 30)))
+        self.assertEqual(len(self.table), 4)
+
+    def test_rows_are_read_back_in_order(self) -> None:
+        self.assertEqual(
+            list(self.table),
+            [
+                FrozenDBRecord("Arthur Dent", 35),
+                FrozenDBRecord("Ford Prefect", 200),
+                FrozenDBRecord("Arthur Dent", 30),
+            ],
+        )
+        self.assertEqual(self.table[-1], FrozenDBRecord("Arthur Dent", 30))
+
+    def test_age_that_does_not_fit_changes_nothing(self) -> None:
+        with self.assertRaises(OverflowError):
+            self.table.add(FrozenDBRecord("Marvin", 2**80))
+        self.assertEqual(len(self.table), 3)
+        self.assertEqual(len(self.table.name_codes), 3)
+        self.assertFalse(FrozenDBRecord("Marvin", 37) in self.table)
+
+    def test_grows(self) -> None:
+        table: ColumnarRecordTable = ColumnarRecordTable()
+        for age in range(1000):
+            self.assertTrue(table.add(FrozenDBRecord(f"Person {age % 7}", age)))
+        self.assertEqual(len(table), 1000)
+        for age in range(1000):
+            self.assertTrue(FrozenDBRecord(f"Person {age % 7}", age) in table)
+            self.assertFalse(FrozenDBRecord(f"Person {(age + 1) % 7}", age) in table)
+
+    def test_smaller_than_a_list(self) -> None:
+        rows: list[FrozenDBRecord] = [
+            FrozenDBRecord(f"Person {index % 100}", index % 50) for index in range(5000)
+        ]
+        table: ColumnarRecordTable = ColumnarRecordTable(rows)
+        list_bytes: int = sys.getsizeof(rows) + sum(
+            sys.getsizeof(row) + sys.getsizeof(row.__dict__) for row in rows
+        )
+        self.assertLess(table.nbytes, list_bytes)
+
+    def test_works_with_store_record_in_db_if_new(self) -> None:
+        self.assertFalse(
+            store_record_in_db_if_new(self.table, FrozenDBRecord("Ford Prefect", 200))
+        )
+        self.assertTrue(
+            store_record_in_db_if_new(self.table, FrozenDBRecord("Ford Prefect", 201))
+        )
+
+
+if __name__ == "__main__":
+    main()
+
+    unittest.main()
@@ -0,0 +1,340 @@
+"""
+This is a record set that several threads can call `store_record_in_db_if_new`
+against at once.
+
+With a shared collection, two threads can both find `row not in current_rows`
+before either adds it, and both insert the row. Holding one lock around the
+check and the insert fixes that, but then only one thread can check a row at
+a time. `StripedRecordSet` splits the rows into stripes by hash, each with its
+own set and lock, so the check-and-insert of a row is atomic while threads
+working on rows in different stripes do not wait for each other.
+
+The database insert itself runs without holding the stripe lock. While it is
+in progress the row is marked pending with a `Future`, and other threads
+storing the same row wait on it to see the real outcome. If the insert fails,
+the row is removed again and a waiting thread inserts it itself.
+
+Running this file prints the throughput for 1 to 8 threads with one stripe
+(a global lock) and with many. Under a GIL build only one thread runs Python
+code at a time, so the stripes mostly matter on a free-threaded build.
+"""
+
+from collections.abc import Iterable, Iterator, Sequence
+from concurrent.futures import Future
+import random
+import sys
+import threading
+import time
+import unittest
+
+from failing_sink import FailingSink
+from frozen_dataclass import FrozenDBRecord
+from record_sink import RecordSink
+from record_store import insert_rows_into_sink
+from record_store import store_record_in_db_if_new as indexed_store_record_in_db_if_new
+
+DEFAULT_STRIPES: int = 64
+
+
+class StripedRecordSet:
+    def __init__(
+        self,
+        rows: Iterable[FrozenDBRecord] = (),
+        sink: RecordSink | None = None,
+        stripes: int = DEFAULT_STRIPES,
+    ) -> None:
+        if stripes < 1:
+            raise ValueError(f"stripes must be at least 1, got {stripes}")
+        # The initial rows are assumed to already be in the sink
+        self.sink: RecordSink | None = sink
+        self._stripes: list[set[FrozenDBRecord]] = [set() for _ in range(stripes)]
+        self._locks: list[threading.Lock] = [threading.Lock() for _ in range(stripes)]
+        # Rows in each stripe whose insert is still running, resolved with
+        # whether the sink added them
+        self._pending: list[dict[FrozenDBRecord, Future[bool]]] = [
+            {} for _ in range(stripes)
+        ]
+        for row in rows:
+            self._stripes[hash(row) % stripes].add(row)
+
+    def _stripe_index(self, row: object) -> int:
+        return hash(row) % len(self._stripes)
+
+    def add_if_new(self, row: FrozenDBRecord) -> bool:
+        """
+        Adds the row unless it is already present, as one atomic step.
+        Returns True if it was added.
+        """
+        index: int = self._stripe_index(row)
+        stripe: set[FrozenDBRecord] = self._stripes[index]
+        with self._locks[index]:
+            if row in stripe:
+                return False
+            stripe.add(row)
+        return True
+
+    def discard(self, row: FrozenDBRecord) -> None:
+        index: int = self._stripe_index(row)
+        with self._locks[index]:
+            self._stripes[index].discard(row)
+
+    def store_record_if_new(self, row: FrozenDBRecord) -> bool:
+        """
+        Tests if the input row is already present.
+
+        If row is already present, return False, indicated no changes to the DB.
+
+        If row is not present, add to the database and return True. Only one
+        thread can add a given row, and the insert itself runs without holding
+        the lock. If the database already had the row it is kept here, but
+        False is returned. If the insert fails the row is removed again, so it
+        can be retried, and the error is raised.
+
+        A thread storing a row whose insert is still running waits for it. If
+        that insert fails, this thread tries the insert itself.
+        """
+        index: int = self._stripe_index(row)
+        stripe: set[FrozenDBRecord] = self._stripes[index]
+        pending: dict[FrozenDBRecord, Future[bool]] = self._pending[index]
+        while True:
+            with self._locks[index]:
+                in_progress: Future[bool] | None = pending.get(row)
+                if in_progress is None:
+                    if row in stripe:
+                        return False
+                    stripe.add(row)
+                    insert: Future[bool] = Future()
+                    pending[row] = insert
+                    break
+            # Another thread is inserting the row, so only report it as present
+            # once that insert has succeeded
+            if in_progress.exception() is None:
+                return False
+
+        # Value is not present in the current rows, so add to DB
+        try:
+            inserted: bool = insert_rows_into_sink(self.sink, [row])[0]
+        except BaseException as error:
+            with self._locks[index]:
+                stripe.discard(row)
+                del pending[row]
+            insert.set_exception(error)
+            raise
+        with self._locks[index]:
+            del pending[row]
+        insert.set_result(inserted)
+        return inserted
+
+    def __contains__(self, row: object) -> bool:
+        try:
+            index: int = self._stripe_index(row)
+        except TypeError:
+            # Unhashable, so it cannot be one of the rows
+            return False
+        with self._locks[index]:
+            return row in self._stripes[index]
+
+    def __len__(self) -> int:
+        # Each stripe's size is read atomically, but not all of them together
+        return sum(len(stripe) for stripe in self._stripes)
+
+    def __iter__(self) -> Iterator[FrozenDBRecord]:
+        """
+        Iterates over a copy of each stripe, taken under that stripe's lock.
+        """
+        for lock, stripe in zip(self._locks, self._stripes):
+            with lock:
+                rows: list[FrozenDBRecord] = list(stripe)
+            yield from rows
+
+
+def store_record_in_db_if_new(
+    current_rows: Iterable[FrozenDBRecord],
+    row: FrozenDBRecord,
+    sink: RecordSink | None = None,
+) -> bool:
+    """
+    Given the current rows, tests if the input row is already present.
+
+    If row is already present, return False, indicated no changes to the DB.
+
+    If row is not present, add to the database and return True. When the
+    current rows are a `StripedRecordSet` this is safe to call from several
+    threads at once, and the row is written to its sink rather than `sink`.
+    """
+    if isinstance(current_rows, StripedRecordSet):
+        return current_rows.store_record_if_new(row)
+    return indexed_store_record_in_db_if_new(current_rows, row, sink)
+
+
+########
+# Main #
+########
+def _run_threads(
+    records: StripedRecordSet, rows: list[FrozenDBRecord], num_threads: int
+) -> tuple[float, int]:
+    """
+    Has every thread store every row, each in its own order, and returns
+    the seconds taken and how many rows were inserted in total.
+    """
+    inserted: list[int] = [0] * num_threads
+    orders: list[list[FrozenDBRecord]] = [
+        random.Random(index).sample(rows, len(rows)) for index in range(num_threads)
+    ]
+    barrier: threading.Barrier = threading.Barrier(num_threads + 1)
+
+    def work(thread_index: int) -> None:
+        barrier.wait()
+        count: int = 0
+        for row in orders[thread_index]:
+            count += records.store_record_if_new(row)
+        inserted[thread_index] = count
+
+    threads: list[threading.Thread] = [
+        threading.Thread(target=work, args=(index,)) for index in range(num_threads)
+    ]
+    for thread in threads:
+        thread.start()
+    barrier.wait()
+    start: float = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - start, sum(inserted)
+
+
+def main() -> None:
+    num_rows: int = 200_000
+    rows: list[FrozenDBRecord] = [
+        FrozenDBRecord(f"Person {index}", index % 100) for index in range(num_rows)
+    ]
+    gil_enabled: bool = getattr(sys, "_is_gil_enabled", lambda: True)()
+    print(
+        f"Python {sys.version.split()[0]}, GIL {'enabled' if gil_enabled else 'disabled'}"
+    )
+
+    for stripes in (1, DEFAULT_STRIPES):
+        for num_threads in (1, 2, 4, 8):
+            seconds, inserted = _run_threads(
+                StripedRecordSet(stripes=stripes), rows, num_threads
+            )
+            assert inserted == num_rows
+            print(
+                f"{stripes:>3} stripes, {num_threads} threads:"
+                f" {num_threads * num_rows / seconds:12,.0f} calls/s"
+            )
+
+
+###########
+# Testing #
+###########
+class SlowFailOnceSink:
+    """
+    A sink whose first insert waits for `release` and then raises. Later
+    inserts are kept in `rows`.
+    """
+
+    def __init__(self) -> None:
+        self.started: threading.Event = threading.Event()
+        self.release: threading.Event = threading.Event()
+        self.calls: int = 0
+        self.rows: list[FrozenDBRecord] = []
+
+    def insert_rows_if_new(self, rows: Sequence[FrozenDBRecord]) -> list[bool]:
+        self.calls += 1
+        if self.calls == 1:
+            self.started.set()
+            self.release.wait()
+            raise RuntimeError("Database is unavailable")
+        self.rows.extend(rows)
+        return [True] * len(rows)
+
+
+class TestStripedRecordSet(unittest.TestCase):
+    def setUp(self) -> None:
+        self.records: StripedRecordSet = StripedRecordSet(
+            [FrozenDBRecord("Ford Prefect", 200)], stripes=4
+        )
+
+    def test_in(self) -> None:
+        self.assertTrue(FrozenDBRecord("Ford Prefect", 200) in self.records)
+        self.assertFalse(FrozenDBRecord("Arthur Dent", 35) in self.records)
+        self.assertFalse([1, 2] in self.records)
+
+    def test_store_record_if_new(self) -> None:
+        self.assertTrue(
+            self.records.store_record_if_new(FrozenDBRecord("Arthur Dent", 35))
+        )
+        self.assertFalse(
+            self.records.store_record_if_new(FrozenDBRecord("Arthur Dent", 35))
+        )
+        self.assertFalse(
+            self.records.store_record_if_new(FrozenDBRecord("Ford Prefect", 200))
+        )
+        self.assertCountEqual(
+            list(self.records),
+            [FrozenDBRecord("Ford Prefect", 200), FrozenDBRecord("Arthur Dent", 35)],
+        )
+
+    def test_failed_insert_can_be_retried(self) -> None:
+        sink: FailingSink = FailingSink(failures=1)
+        records: StripedRecordSet = StripedRecordSet(sink=sink)
+        with self.assertRaises(RuntimeError):
+            records.store_record_if_new(FrozenDBRecord("Arthur Dent", 35))
+        self.assertFalse(FrozenDBRecord("Arthur Dent", 35) in records)
+        self.assertTrue(records.store_record_if_new(FrozenDBRecord("Arthur Dent", 35)))
+        self.assertEqual(sink.rows, [FrozenDBRecord("Arthur Dent", 35)])
+
+    def test_waits_for_a_pending_insert_that_fails(self) -> None:
+        sink: SlowFailOnceSink = SlowFailOnceSink()
+        records: StripedRecordSet = StripedRecordSet(sink=sink)
+        row: FrozenDBRecord = FrozenDBRecord("Arthur Dent", 35)
+        results: dict[str, bool | BaseException] = {}
+
+        def store(name: str) -> None:
+            try:
+                results[name] = records.store_record_if_new(row)
+            except BaseException as error:
+                results[name] = error
+
+        # Let the first insert finish even if an assertion fails first
+        self.addCleanup(sink.release.set)
+        first: threading.Thread = threading.Thread(target=store, args=("first",))
+        first.start()
+        sink.started.wait()
+        # The first insert is in progress, so the second call has to wait on it
+        second: threading.Thread = threading.Thread(target=store, args=("second",))
+        second.start()
+        second.join(timeout=0.1)
+        self.assertTrue(second.is_alive())
+        sink.release.set()
+        first.join()
+        second.join()
+
+        self.assertIsInstance(results["first"], RuntimeError)
+        self.assertIs(results["second"], True)
+        self.assertTrue(row in records)
+        self.assertEqual(sink.rows, [row])
+
+    def test_store_record_in_db_if_new(self) -> None:
+        self.assertFalse(
+            store_record_in_db_if_new(self.records, FrozenDBRecord("Ford Prefect", 200))
+        )
+        self.assertTrue(
+            store_record_in_db_if_new(
+                [FrozenDBRecord("Ford Prefect", 200)], FrozenDBRecord("Arthur Dent", 35)
+            )
+        )
+
+    def test_each_row_is_inserted_once_across_threads(self) -> None:
+        rows: list[FrozenDBRecord] = [
+            FrozenDBRecord("Marvin", age) for age in range(2_000)
+        ]
+        for stripes in (1, 16):
+            _, inserted = _run_threads(StripedRecordSet(stripes=stripes), rows, 8)
+            self.assertEqual(inserted, len(rows))
+
+
+if __name__ == "__main__":
+    main()
+
+    unittest.main()
@@ -0,0 +1,55 @@
+"""
+This is a `RecordSink` for the tests of the record stores, which fails its
+inserts on demand.
+
+It lets the tests check that a failed insert leaves nothing behind, so the
+same rows can be inserted again once the database is back.
+"""
+
+from collections.abc import Sequence
+import unittest
+
+from frozen_dataclass import FrozenDBRecord
+
+
+class FailingSink:
+    """
+    A sink whose first `failures` inserts raise, or every insert when
+    `failures` is None. Later inserts are kept in `rows`.
+    """
+
+    def __init__(self, failures: int | None = None) -> None:
+        self.failures: int | None = failures
+        self.rows: list[FrozenDBRecord] = []
+
+    def insert_rows_if_new(self, rows: Sequence[FrozenDBRecord]) -> list[bool]:
+        if self.failures is None or self.failures > 0:
+            if self.failures is not None:
+                self.failures -= 1
+            raise RuntimeError("Database is unavailable")
+        self.rows.extend(rows)
+        return [True] * len(rows)
+
+
+###########
+# Testing #
+###########
+class TestFailingSink(unittest.TestCase):
+    def test_fails_then_recovers(self) -> None:
+        sink: FailingSink = FailingSink(failures=1)
+        rows: list[FrozenDBRecord] = [FrozenDBRecord("Arthur Dent", 35)]
+        with self.assertRaises(RuntimeError):
+            sink.insert_rows_if_new(rows)
+        self.assertEqual(sink.insert_rows_if_new(rows), [True])
+        self.assertEqual(sink.rows, rows)
+
+    def test_always_fails(self) -> None:
+        sink: FailingSink = FailingSink()
+        for _ in range(3):
+            with self.assertRaises(RuntimeError):
+                sink.insert_rows_if_new([FrozenDBRecord("Arthur Dent", 35)])
+        self.assertEqual(sink.rows, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
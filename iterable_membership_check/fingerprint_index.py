@@ -0,0 +1,439 @@
+"""
+This is a dedupe index for `store_record_in_db_if_new` that is kept on disk,
+so a restarted process does not have to reload every row from the database.
+
+`FingerprintIndex` is an open addressing hash table of 64-bit record
+fingerprints in a memory mapped file. Opening it only maps the file and checks
+the header, so it is O(1) however many rows it holds: the operating system
+reads pages in as lookups touch them. Each new row is written to the table
+as it is stored, so the file is always up to date.
+
+On open the header is checked for a magic number, version, checksum and a size
+that matches the file. A flag in the header is set while the index is open
+for writing; if it is still set on open, the previous process did not close
+the index cleanly, so the table is scanned to recount its rows.
+
+Fingerprints are not the rows themselves: two rows with the same fingerprint
+look like duplicates. With 64-bit fingerprints the chance of that across 10**8
+rows is about 1 in 3,700.
+"""
+
+from collections.abc import Iterable
+from hashlib import blake2b
+import mmap
+import os
+import struct
+import tempfile
+import time
+from types import TracebackType
+import unittest
+import zlib
+
+from frozen_dataclass import FrozenDBRecord
+from original_function import DBRecord
+from record_sink import RecordSink, SQLiteRecordSink
+from record_store import insert_rows_into_sink
+
+MAGIC: bytes = b"FPINDEX\x00"
+VERSION: int = 1
+# Magic, version, flags, capacity, count, then a CRC32 of those fields
+_HEADER: struct.Struct = struct.Struct("<8sIIQQ")
+_CHECKSUM: struct.Struct = struct.Struct("<I")
+HEADER_SIZE: int = 64
+SLOT_SIZE: int = 8
+
+_FLAG_OPEN: int = 1
+_EMPTY_SLOT: int = 0
+DEFAULT_CAPACITY: int = 1024
+
+
+class CorruptIndexError(ValueError):
+    pass
+
+
+def record_fingerprint(row: FrozenDBRecord) -> int:
+    """
+    Given a row, returns a non-zero 64-bit fingerprint that is the same in
+    every process (unlike `hash`, which is randomized for strings).
+    """
+    name: bytes = row.name.encode("utf-8", "surrogatepass")
+    # The name length is included so that no two (name, age) pairs are encoded the same
+    digest: bytes = blake2b(
+        b"%d:%s%d" % (len(name), name, row.age), digest_size=SLOT_SIZE
+    ).digest()
+    # Zero marks an empty slot
+    return int.from_bytes(digest, "little") or 1
+
+
+class FingerprintIndex:
+    def __init__(
+        self,
+        path: str | os.PathLike[str],
+        sink: RecordSink | None = None,
+        capacity: int = DEFAULT_CAPACITY,
+    ) -> None:
+        """
+        Opens the index at `path`, creating it with room for `capacity`
+        fingerprints if the file does not exist.
+        """
+        self.path: str | os.PathLike[str] = path
+        self.sink: RecordSink | None = sink
+        # True if the previous process did not close the index cleanly
+        self.recovered: bool = False
+        if not os.path.exists(path) or os.path.getsize(path) == 0:
+            _create_file(path, capacity)
+        self._open()
+        if self._flags & _FLAG_OPEN:
+            self.recovered = True
+            self._count = sum(1 for slot in self._slots if slot != _EMPTY_SLOT)
+        self._flags |= _FLAG_OPEN
+        self._write_header()
+        self._map.flush()
+
+    @classmethod
+    def build(
+        cls,
+        path: str | os.PathLike[str],
+        rows: Iterable[FrozenDBRecord],
+        sink: RecordSink | None = None,
+    ) -> "FingerprintIndex":
+        """
+        Creates a new index at `path` from every current row, replacing any
+        index already there. This is the full reload a warm restart skips.
+        """
+        if os.path.exists(path):
+            os.remove(path)
+        index: FingerprintIndex = cls(path, sink)
+        for row in rows:
+            index.add(row)
+        return index
+
+    def _open(self) -> None:
+        """
+        Maps the file and checks its header, without changing anything in it.
+        """
+        with open(self.path, "r+b") as file:
+            if os.fstat(file.fileno()).st_size < HEADER_SIZE:
+                raise CorruptIndexError(f"{self.path} is too small to be an index")
+            # The mapping stays valid after the file is closed
+            self._map: mmap.mmap = mmap.mmap(file.fileno(), 0)
+        try:
+            self._check_header()
+        except CorruptIndexError:
+            self._map.close()
+            raise
+        self._slots: memoryview = memoryview(self._map)[HEADER_SIZE:].cast("Q")
+
+    def _unmap(self) -> None:
+        self._slots.release()
+        self._map.close()
+
+    def _check_header(self) -> None:
+        magic, version, self._flags, self._capacity, self._count = _HEADER.unpack_from(
+            self._map
+        )
+        if magic != MAGIC:
+            raise CorruptIndexError(f"{self.path} is not a fingerprint index")
+        if version != VERSION:
+            raise CorruptIndexError(
+                f"{self.path} has version {version}, expected {VERSION}"
+            )
+        (checksum,) = _CHECKSUM.unpack_from(self._map, _HEADER.size)
+        if checksum != zlib.crc32(self._map[: _HEADER.size]):
+            raise CorruptIndexError(f"{self.path} has a bad header checksum")
+        if self._capacity < 1 or self._capacity & (self._capacity - 1):
+            raise CorruptIndexError(
+                f"{self.path} has capacity {self._capacity}, not a power of two"
+            )
+        if len(self._map) != HEADER_SIZE + self._capacity * SLOT_SIZE:
+            raise CorruptIndexError(
+                f"{self.path} is {len(self._map)} bytes, expected"
+                f" {HEADER_SIZE + self._capacity * SLOT_SIZE}"
+            )
+        if self._count > self._capacity:
+            raise CorruptIndexError(
+                f"{self.path} claims {self._count} rows in {self._capacity} slots"
+            )
+
+    def _write_header(self) -> None:
+        _HEADER.pack_into(
+            self._map, 0, MAGIC, VERSION, self._flags, self._capacity, self._count
+        )
+        _CHECKSUM.pack_into(
+            self._map, _HEADER.size, zlib.crc32(self._map[: _HEADER.size])
+        )
+
+    def _find_slot(self, fingerprint: int) -> tuple[int, bool]:
+        """
+        Returns the slot holding the fingerprint, or the empty slot where it
+        would go, and whether it was found.
+        """
+        mask: int = self._capacity - 1
+        slot: int = fingerprint & mask
+        while (entry := self._slots[slot]) != _EMPTY_SLOT:
+            if entry == fingerprint:
+                return slot, True
+            slot = (slot + 1) & mask
+        return slot, False
+
+    def _grow(self) -> None:
+        """
+        Rehashes into a new file twice the size, which then replaces the
+        current one. The new file is complete before the replace, so a crash
+        leaves either the old index or the new one.
+        """
+        temp_path: str = f"{os.fspath(self.path)}.grow"
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        with FingerprintIndex(temp_path, capacity=2 * self._capacity) as grown:
+            for fingerprint in self._slots:
+                if fingerprint != _EMPTY_SLOT:
+                    grown._add_fingerprint(fingerprint)
+            grown.flush()
+        self._unmap()
+        os.replace(temp_path, self.path)
+        self._open()
+        self._flags |= _FLAG_OPEN
+        self._write_header()
+
+    def _add_fingerprint(self, fingerprint: int) -> bool:
+        slot, found = self._find_slot(fingerprint)
+        if found:
+            return False
+        # Keep the load factor at most 1/2 so probe sequences stay short
+        if 2 * (self._count + 1) > self._capacity:
+            self._grow()
+            slot, _ = self._find_slot(fingerprint)
+        self._slots[slot] = fingerprint
+        self._count += 1
+        self._write_header()
+        return True
+
+    def add(self, row: FrozenDBRecord) -> bool:
+        """
+        Adds the row's fingerprint unless it is already present.
+        Returns True if it was added.
+        """
+        return self._add_fingerprint(record_fingerprint(row))
+
+    def store_record_if_new(self, row: FrozenDBRecord) -> bool:
+        """
+        Tests if the input row is already present.
+
+        If row is already present, return False, indicated no changes to the DB.
+
+        If row is not present, add to the database and return True. If the
+        database already had the row it is added to the index, but False is
+        returned. The row is only added to the index once the insert succeeds,
+        so a crash in between leaves the index behind the database rather than
+        ahead of it.
+        """
+        if row in self:
+            return False
+
+        # Value is not present in the current rows, so add to DB
+        inserted: bool = insert_rows_into_sink(self.sink, [row])[0]
+        self.add(row)
+        return inserted
+
+    def __contains__(self, row: object) -> bool:
+        if not isinstance(row, FrozenDBRecord):
+            return False
+        try:
+            return self._find_slot(record_fingerprint(row))[1]
+        except TypeError:
+            # An age that is not an int cannot be fingerprinted, so was never added
+            return False
+
+    def __len__(self) -> int:
+        return self._count
+
+    @property
+    def capacity(self) -> int:
+        return self._capacity
+
+    def flush(self) -> None:
+        """
+        Writes any changes in memory out to the file.
+        """
+        self._map.flush()
+
+    def close(self) -> None:
+        if self._map.closed:
+            return
+        self._flags &= ~_FLAG_OPEN
+        self._write_header()
+        self._map.flush()
+        self._unmap()
+
+    def __enter__(self) -> "FingerprintIndex":
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_value: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        self.close()
+
+
+def _create_file(path: str | os.PathLike[str], capacity: int) -> None:
+    """
+    Writes an empty index with room for `capacity` fingerprints, rounded up
+    to a power of two.
+    """
+    capacity = 1 << max(capacity - 1, 1).bit_length()
+    header: bytearray = bytearray(HEADER_SIZE)
+    _HEADER.pack_into(header, 0, MAGIC, VERSION, 0, capacity, 0)
+    _CHECKSUM.pack_into(header, _HEADER.size, zlib.crc32(header[: _HEADER.size]))
+    with open(path, "wb") as file:
+        file.write(header)
+        file.truncate(HEADER_SIZE + capacity * SLOT_SIZE)
+
+
+########
+# Main #
+########
+def main() -> None:
+    num_rows: int = 10**6
+    rows: list[FrozenDBRecord] = [
+        FrozenDBRecord(f"Person {index}", index % 100) for index in range(num_rows)
+    ]
+    with tempfile.TemporaryDirectory() as temp_dir:
+        path: str = os.path.join(temp_dir, "records.idx")
+
+        start: float = time.perf_counter()
+        current_rows: set[FrozenDBRecord] = set(rows)
+        print(
+            f"Rebuilding current_rows from rows already in memory: {time.perf_counter() - start:.3f}s"
+        )
+
+        start = time.perf_counter()
+        FingerprintIndex.build(path, rows).close()
+        print(f"Building the index once: {time.perf_counter() - start:.3f}s")
+
+        start = time.perf_counter()
+        index: FingerprintIndex = FingerprintIndex(path)
+        print(f"Opening the index on restart: {time.perf_counter() - start:.6f}s")
+
+        start = time.perf_counter()
+        for row in rows[:10_000]:
+            assert row in index
+        print(f"10,000 lookups after opening: {time.perf_counter() - start:.3f}s")
+        print(f"{len(index)} rows in the index, {len(current_rows)} in memory")
+        index.close()
+
+
+###########
+# Testing #
+###########
+class TestFingerprintIndex(unittest.TestCase):
+    def setUp(self) -> None:
+        self.temp_dir: tempfile.TemporaryDirectory[str] = tempfile.TemporaryDirectory()
+        self.path: str = os.path.join(self.temp_dir.name, "records.idx")
+
+    def tearDown(self) -> None:
+        self.temp_dir.cleanup()
+
+    def test_add_and_in(self) -> None:
+        with FingerprintIndex(self.path) as index:
+            self.assertTrue(index.add(FrozenDBRecord("Arthur Dent", 35)))
+            self.assertFalse(index.add(FrozenDBRecord("Arthur Dent", 35)))
+            self.assertTrue(FrozenDBRecord("Arthur Dent", 35) in index)
+            self.assertFalse(FrozenDBRecord("Arthur Dent", 36) in index)
+            self.assertFalse(DBRecord("Arthur Dent", 35) in index)
+            self.assertEqual(len(index), 1)
+
+    def test_survives_reopening(self) -> None:
+        FingerprintIndex.build(
+            self.path,
+            [FrozenDBRecord("Arthur Dent", 35), FrozenDBRecord("Ford Prefect", 200)],
+        ).close()
+        with FingerprintIndex(self.path) as index:
+            self.assertFalse(index.recovered)
+            self.assertEqual(len(index), 2)
+            self.assertTrue(FrozenDBRecord("Ford Prefect", 200) in index)
+
+    def test_fingerprint_encoding_is_unambiguous(self) -> None:
+        self.assertNotEqual(
+            record_fingerprint(FrozenDBRecord("a1", 2)),
+            record_fingerprint(FrozenDBRecord("a", 12)),
+        )
+
+    def test_grows(self) -> None:
+        with FingerprintIndex(self.path, capacity=8) as index:
+            for age in range(100):
+                index.add(FrozenDBRecord("Marvin", age))
+            self.assertGreaterEqual(index.capacity, 200)
+        with FingerprintIndex(self.path) as index:
+            self.assertEqual(len(index), 100)
+            for age in range(100):
+                self.assertTrue(FrozenDBRecord("Marvin", age) in index)
+
+    def test_unclean_close_is_recovered(self) -> None:
+        index: FingerprintIndex = FingerprintIndex(self.path)
+        index.add(FrozenDBRecord("Arthur Dent", 35))
+        # Simulate a crash after a slot was written but before the header was
+        fingerprint: int = record_fingerprint(FrozenDBRecord("Trillian", 30))
+        # There is no public way to write a slot alone, or to drop the mapping
+        # without marking the index closed
+        slot, _ = index._find_slot(fingerprint)  # type: ignore
+        index._slots[slot] = fingerprint  # type: ignore
+        index.flush()
+        index._unmap()  # type: ignore
+        with FingerprintIndex(self.path) as reopened:
+            self.assertTrue(reopened.recovered)
+            self.assertEqual(len(reopened), 2)
+
+    def test_corruption_is_detected(self) -> None:
+        FingerprintIndex(self.path).close()
+        with open(self.path, "r+b") as file:
+            file.seek(_HEADER.size - 1)
+            file.write(b"\xff")
+        with self.assertRaises(CorruptIndexError):
+            FingerprintIndex(self.path)
+
+    def test_truncation_is_detected(self) -> None:
+        FingerprintIndex(self.path).close()
+        with open(self.path, "r+b") as file:
+            file.truncate(HEADER_SIZE + SLOT_SIZE)
+        with self.assertRaises(CorruptIndexError):
+            FingerprintIndex(self.path)
+
+    def test_other_files_are_rejected(self) -> None:
+        with open(self.path, "wb") as file:
+            file.write(b"Not an index, just some text" * 10)
+        with self.assertRaises(CorruptIndexError):
+            FingerprintIndex(self.path)
+
+    def test_store_record_if_new_with_sink(self) -> None:
+        sink: SQLiteRecordSink = SQLiteRecordSink(
+            os.path.join(self.temp_dir.name, "records.db")
+        )
+        try:
+            with FingerprintIndex(self.path, sink) as index:
+                self.assertTrue(
+                    index.store_record_if_new(FrozenDBRecord("Arthur Dent", 35))
+                )
+            with FingerprintIndex(self.path, sink) as index:
+                self.assertFalse(
+                    index.store_record_if_new(FrozenDBRecord("Arthur Dent", 35))
+                )
+            self.assertEqual(sink.rows(), [FrozenDBRecord("Arthur Dent", 35)])
+
+            # A row the database already has is indexed, but not reported as new
+            sink.insert_rows([FrozenDBRecord("Trillian", 30)])
+            with FingerprintIndex(self.path, sink) as index:
+                self.assertFalse(
+                    index.store_record_if_new(FrozenDBRecord("Trillian", 30))
+                )
+                self.assertTrue(FrozenDBRecord("Trillian", 30) in index)
+        finally:
+            sink.close()
+
+
+if __name__ == "__main__":
+    main()
+
+    unittest.main()
@@ -0,0 +1,473 @@
+"""
+This is a record store that owns the current rows, so that checking if a row
+is new does not depend on what kind of iterable the caller passes in.
+
+`store_record_in_db_if_new` in `frozen_dataclass.py` does `row in current_rows`,
+which is O(n) when `current_rows` is a list, making a load of n rows O(n^2).
+`RecordStore` keeps a hash index of `FrozenDBRecord` rows (plus secondary
+indexes on `name` and `age`), so checking and inserting a row is O(1).
+
+`store_record_in_db_if_new` here inserts through a `RecordStore` when given
+one, and otherwise falls back to the original function for any other iterable.
+
+`store_records_in_db_if_new` does the same for a whole batch of rows in one
+pass, deduplicating against the current rows and within the batch itself.
+The new rows are then inserted together, and which rows were inserted is
+returned as a bitmap rather than a list of bools.
+
+New rows are written to a `RecordSink` (see `record_sink.py`) when one is
+given, such as `SQLiteRecordSink`. Without one, nothing is persisted. If the
+sink raises, the rows are taken back out of the `RecordStore`, so the same
+call can be retried. A row only counts as inserted if the sink reports adding
+it, since the database may already have it (eg: SQLite's UNIQUE index).
+"""
+
+from collections.abc import Container, Iterable, Iterator
+from dataclasses import dataclass, field
+import os
+import tempfile
+import unittest
+
+from failing_sink import FailingSink
+from frozen_dataclass import FrozenDBRecord
+from frozen_dataclass import (
+    store_record_in_db_if_new as iterable_store_record_in_db_if_new,
+)
+from record_sink import RecordSink, SQLiteRecordSink
+
+
+@dataclass
+class BatchInsertResult:
+    num_rows: int
+    # Bit `i % 8` of byte `i // 8` is set when row `i` of the batch was inserted
+    inserted_bitmap: bytearray = field(default_factory=bytearray)
+    # The inserted rows, in batch order
+    new_rows: list[FrozenDBRecord] = field(default_factory=list[FrozenDBRecord])
+
+    def __post_init__(self) -> None:
+        if not self.inserted_bitmap:
+            self.inserted_bitmap = bytearray((self.num_rows + 7) // 8)
+
+    def __len__(self) -> int:
+        return self.num_rows
+
+    def __getitem__(self, index: int) -> bool:
+        """
+        Returns True if the row at `index` in the batch was inserted.
+        """
+        if not 0 <= index < self.num_rows:
+            raise IndexError(f"Index {index} out of range for {self.num_rows} rows")
+        return bool(self.inserted_bitmap[index >> 3] & (1 << (index & 7)))
+
+    @property
+    def inserted_count(self) -> int:
+        return len(self.new_rows)
+
+    @property
+    def skipped_count(self) -> int:
+        return self.num_rows - len(self.new_rows)
+
+    def mark_inserted(self, index: int, row: FrozenDBRecord) -> None:
+        self.inserted_bitmap[index >> 3] |= 1 << (index & 7)
+        self.new_rows.append(row)
+
+
+def insert_rows_into_sink(
+    sink: RecordSink | None, new_rows: list[FrozenDBRecord]
+) -> list[bool]:
+    """
+    Inserts all of the new rows into the database at once, returning whether
+    the sink reported adding each one. Without a sink, every row counts as added.
+    """
+    if sink is None or not new_rows:
+        return [True] * len(new_rows)
+    return sink.insert_rows_if_new(new_rows)
+
+
+def _dedupe_batch(
+    current_rows: Container[FrozenDBRecord], rows: Iterable[FrozenDBRecord]
+) -> BatchInsertResult:
+    """
+    Makes one pass over the rows, marking each that is not in `current_rows`
+    and has not been seen earlier in the batch.
+    """
+    batch: list[FrozenDBRecord] = list(rows)
+    result: BatchInsertResult = BatchInsertResult(len(batch))
+    seen_in_batch: set[FrozenDBRecord] = set()
+    for index, row in enumerate(batch):
+        if row in current_rows or row in seen_in_batch:
+            continue
+        seen_in_batch.add(row)
+        result.mark_inserted(index, row)
+    return result
+
+
+def _keep_inserted(
+    candidates: BatchInsertResult, inserted: list[bool]
+) -> BatchInsertResult:
+    """
+    Given the rows a batch would insert and whether the sink added each one,
+    returns the result with only the rows the sink added.
+    """
+    if all(inserted):
+        return candidates
+    result: BatchInsertResult = BatchInsertResult(candidates.num_rows)
+    candidate_indices: Iterator[int] = (
+        index for index in range(candidates.num_rows) if candidates[index]
+    )
+    for index, row, added in zip(candidate_indices, candidates.new_rows, inserted):
+        if added:
+            result.mark_inserted(index, row)
+    return result
+
+
+class RecordStore:
+    def __init__(
+        self, rows: Iterable[FrozenDBRecord] = (), sink: RecordSink | None = None
+    ) -> None:
+        # The initial rows are assumed to already be in the sink
+        self.sink: RecordSink | None = sink
+        # A dict (rather than a set) keeps the rows in insertion order
+        self._rows: dict[FrozenDBRecord, None] = {}
+        self._rows_by_name: dict[str, set[FrozenDBRecord]] = {}
+        self._rows_by_age: dict[int, set[FrozenDBRecord]] = {}
+        for row in rows:
+            self._add_to_indexes(row)
+
+    def _add_to_indexes(self, row: FrozenDBRecord) -> bool:
+        """
+        Adds the row to every index, returning False if it was already present.
+        """
+        if row in self._rows:
+            return False
+        self._rows[row] = None
+        self._rows_by_name.setdefault(row.name, set()).add(row)
+        self._rows_by_age.setdefault(row.age, set()).add(row)
+        return True
+
+    def store_record_if_new(self, row: FrozenDBRecord) -> bool:
+        """
+        Tests if the input row is already present.
+
+        If row is already present, return False, indicated no changes to the DB.
+
+        If row is not present, add to the database and return True. If the
+        database already had the row it is kept here, but False is returned.
+        If the insert fails the row is removed again, so it can be retried.
+        """
+        if not self._add_to_indexes(row):
+            return False
+
+        # Value is not present in the current rows, so add to DB
+        try:
+            return insert_rows_into_sink(self.sink, [row])[0]
+        except BaseException:
+            self.remove(row)
+            raise
+
+    def store_records_if_new(self, rows: Iterable[FrozenDBRecord]) -> BatchInsertResult:
+        """
+        Tests each input row against the present rows and earlier rows in the batch.
+
+        The rows that are not present are added to the database together,
+        and the result says which rows of the batch the database added. Rows
+        it already had are kept here, but are not marked as inserted. If the
+        insert fails the rows are removed again, so the batch can be retried.
+        """
+        candidates: BatchInsertResult = _dedupe_batch(self, rows)
+        for row in candidates.new_rows:
+            self._add_to_indexes(row)
+        try:
+            inserted: list[bool] = insert_rows_into_sink(self.sink, candidates.new_rows)
+        except BaseException:
+            for row in candidates.new_rows:
+                self.remove(row)
+            raise
+        return _keep_inserted(candidates, inserted)
+
+    def remove(self, row: FrozenDBRecord) -> None:
+        """
+        Removes the row from every index, raising KeyError if it is not present.
+        """
+        del self._rows[row]
+        self._rows_by_name[row.name].discard(row)
+        if not self._rows_by_name[row.name]:
+            del self._rows_by_name[row.name]
+        self._rows_by_age[row.age].discard(row)
+        if not self._rows_by_age[row.age]:
+            del self._rows_by_age[row.age]
+
+    def rows_with_name(self, name: str) -> frozenset[FrozenDBRecord]:
+        return frozenset(self._rows_by_name.get(name, ()))
+
+    def rows_with_age(self, age: int) -> frozenset[FrozenDBRecord]:
+        return frozenset(self._rows_by_age.get(age, ()))
+
+    def __contains__(self, row: object) -> bool:
+        return row in self._rows
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def __iter__(self) -> Iterator[FrozenDBRecord]:
+        return iter(self._rows)
+
+
+def store_record_in_db_if_new(
+    current_rows: Iterable[FrozenDBRecord],
+    row: FrozenDBRecord,
+    sink: RecordSink | None = None,
+) -> bool:
+    """
+    Given the current rows, tests if the input row is already present.
+
+    If row is already present, return False, indicated no changes to the DB.
+
+    If row is not present, add to the database and return True, unless the
+    sink reports that the database already had it. When the current rows are
+    a `RecordStore` the row is also added to it, so later calls see it, and
+    it is written to the store's sink rather than `sink`.
+    """
+    if isinstance(current_rows, RecordStore):
+        return current_rows.store_record_if_new(row)
+    if not iterable_store_record_in_db_if_new(current_rows, row):
+        return False
+    return insert_rows_into_sink(sink, [row])[0]
+
+
+def store_records_in_db_if_new(
+    current_rows: Iterable[FrozenDBRecord],
+    rows: Iterable[FrozenDBRecord],
+    sink: RecordSink | None = None,
+) -> BatchInsertResult:
+    """
+    Given the current rows, tests if each input row is already present or
+    appeared earlier in the batch.
+
+    The rows that are not present are added to the database together, and
+    the result says which rows of the batch the database added. When the current rows
+    are a `RecordStore` the new rows are also added to it, and written to
+    the store's sink rather than `sink`.
+    """
+    if isinstance(current_rows, RecordStore):
+        return current_rows.store_records_if_new(rows)
+    # Build the membership index once for the whole batch, not once per row
+    candidates: BatchInsertResult = _dedupe_batch(set(current_rows), rows)
+    return _keep_inserted(candidates, insert_rows_into_sink(sink, candidates.new_rows))
+
+
+###########
+# Testing #
+###########
+class TestRecordStore(unittest.TestCase):
+    def setUp(self) -> None:
+        self.store: RecordStore = RecordStore(
+            [
+                FrozenDBRecord("Ford Prefect", 200),
+                FrozenDBRecord("Arthur Dent", 35),
+                FrozenDBRecord("Zaphod Beeblebrox", 200),
+            ]
+        )
+
+    def test_in(self) -> None:
+        self.assertTrue(FrozenDBRecord("Arthur Dent", 35) in self.store)
+        self.assertFalse(FrozenDBRecord("Arthur Dent", 36) in self.store)
+        self.assertEqual(len(self.store), 3)
+
+    def test_duplicate_initial_rows(self) -> None:
+        store: RecordStore = RecordStore([FrozenDBRecord("Arthur Dent", 35)] * 2)
+        self.assertEqual(list(store), [FrozenDBRecord("Arthur Dent", 35)])
+
+    def test_store_record_if_new(self) -> None:
+        row: FrozenDBRecord = FrozenDBRecord("Trillian", 30)
+        self.assertTrue(self.store.store_record_if_new(row))
+        self.assertFalse(self.store.store_record_if_new(row))
+        self.assertTrue(row in self.store)
+
+    def test_secondary_indexes(self) -> None:
+        self.assertEqual(
+            self.store.rows_with_age(200),
+            {
+                FrozenDBRecord("Ford Prefect", 200),
+                FrozenDBRecord("Zaphod Beeblebrox", 200),
+            },
+        )
+        self.store.store_record_if_new(FrozenDBRecord("Arthur Dent", 36))
+        self.assertEqual(len(self.store.rows_with_name("Arthur Dent")), 2)
+        self.assertEqual(self.store.rows_with_name("Marvin"), frozenset())
+
+    def test_remove(self) -> None:
+        self.store.remove(FrozenDBRecord("Arthur Dent", 35))
+        self.assertFalse(FrozenDBRecord("Arthur Dent", 35) in self.store)
+        self.assertEqual(self.store.rows_with_name("Arthur Dent"), frozenset())
+        with self.assertRaises(KeyError):
+            self.store.remove(FrozenDBRecord("Arthur Dent", 35))
+
+
+class TestStoreRecordInDBIfNew(unittest.TestCase):
+    def test_record_store_adds_record(self) -> None:
+        current_rows: RecordStore = RecordStore()
+        row: FrozenDBRecord = FrozenDBRecord("Arthur Dent", 35)
+        self.assertTrue(store_record_in_db_if_new(current_rows, row))
+        self.assertFalse(store_record_in_db_if_new(current_rows, row))
+
+    def test_list_without_match_adds_record(self) -> None:
+        current_rows: list[FrozenDBRecord] = [FrozenDBRecord("Ford Prefect", 200)]
+        row: FrozenDBRecord = FrozenDBRecord("Arthur Dent", 35)
+        self.assertTrue(store_record_in_db_if_new(current_rows, row))
+
+    def test_list_with_match_does_not_add_record(self) -> None:
+        current_rows: list[FrozenDBRecord] = [FrozenDBRecord("Arthur Dent", 35)]
+        row: FrozenDBRecord = FrozenDBRecord("Arthur Dent", 35)
+        self.assertFalse(store_record_in_db_if_new(current_rows, row))
+
+    def test_dict_with_match_does_not_add_record(self) -> None:
+        current_rows: dict[FrozenDBRecord, str] = {
+            FrozenDBRecord("Arthur Dent", 35): "Human"
+        }
+        row: FrozenDBRecord = FrozenDBRecord("Arthur Dent", 35)
+        self.assertFalse(store_record_in_db_if_new(current_rows, row))
+
+
+class TestStoreRecordsInDBIfNew(unittest.TestCase):
+    def setUp(self) -> None:
+        self.batch: list[FrozenDBRecord] = [
+            FrozenDBRecord("Arthur Dent", 35),
+            FrozenDBRecord("Trillian", 30),
+            FrozenDBRecord("Ford Prefect", 200),
+            FrozenDBRecord("Trillian", 30),
+            FrozenDBRecord("Marvin", 37),
+        ]
+
+    def assert_expected_result(self, result: BatchInsertResult) -> None:
+        self.assertEqual(len(result), 5)
+        self.assertEqual([result[index] for index in range(5)], [0, 1, 0, 0, 1])
+        self.assertEqual(result.inserted_bitmap, bytearray([0b10010]))
+        self.assertEqual(
+            result.new_rows,
+            [FrozenDBRecord("Trillian", 30), FrozenDBRecord("Marvin", 37)],
+        )
+        self.assertEqual((result.inserted_count, result.skipped_count), (2, 3))
+
+    def test_record_store(self) -> None:
+        current_rows: RecordStore = RecordStore(
+            [FrozenDBRecord("Arthur Dent", 35), FrozenDBRecord("Ford Prefect", 200)]
+        )
+        self.assert_expected_result(
+            store_records_in_db_if_new(current_rows, self.batch)
+        )
+        self.assertEqual(len(current_rows), 4)
+        self.assertEqual(
+            store_records_in_db_if_new(current_rows, self.batch).inserted_count, 0
+        )
+
+    def test_list(self) -> None:
+        current_rows: list[FrozenDBRecord] = [
+            FrozenDBRecord("Arthur Dent", 35),
+            FrozenDBRecord("Ford Prefect", 200),
+        ]
+        self.assert_expected_result(
+            store_records_in_db_if_new(current_rows, iter(self.batch))
+        )
+
+    def test_empty_batch(self) -> None:
+        result: BatchInsertResult = store_records_in_db_if_new([], [])
+        self.assertEqual(len(result), 0)
+        self.assertEqual(result.inserted_bitmap, bytearray())
+
+    def test_index_out_of_range_raises(self) -> None:
+        result: BatchInsertResult = store_records_in_db_if_new([], self.batch)
+        with self.assertRaises(IndexError):
+            result[5]
+
+
+class TestRecordStoreWithSink(unittest.TestCase):
+    def setUp(self) -> None:
+        self.temp_dir: tempfile.TemporaryDirectory[str] = tempfile.TemporaryDirectory()
+        self.sink: SQLiteRecordSink = SQLiteRecordSink(
+            os.path.join(self.temp_dir.name, "records.db")
+        )
+
+    def tearDown(self) -> None:
+        self.sink.close()
+        self.temp_dir.cleanup()
+
+    def test_new_rows_reach_the_sink(self) -> None:
+        store: RecordStore = RecordStore(sink=self.sink)
+        self.assertTrue(store.store_record_if_new(FrozenDBRecord("Arthur Dent", 35)))
+        self.assertFalse(store.store_record_if_new(FrozenDBRecord("Arthur Dent", 35)))
+        store.store_records_if_new(
+            [FrozenDBRecord("Trillian", 30), FrozenDBRecord("Arthur Dent", 35)]
+        )
+        self.assertCountEqual(
+            self.sink.rows(),
+            [FrozenDBRecord("Arthur Dent", 35), FrozenDBRecord("Trillian", 30)],
+        )
+
+    def test_plain_iterable_with_sink(self) -> None:
+        current_rows: list[FrozenDBRecord] = [FrozenDBRecord("Ford Prefect", 200)]
+        self.assertFalse(
+            store_record_in_db_if_new(
+                current_rows, FrozenDBRecord("Ford Prefect", 200), self.sink
+            )
+        )
+        self.assertTrue(
+            store_record_in_db_if_new(
+                current_rows, FrozenDBRecord("Arthur Dent", 35), self.sink
+            )
+        )
+        result: BatchInsertResult = store_records_in_db_if_new(
+            current_rows, [FrozenDBRecord("Marvin", 37)], self.sink
+        )
+        self.assertEqual(result.inserted_count, 1)
+        self.assertEqual(len(self.sink), 2)
+
+    def test_rows_the_database_already_has(self) -> None:
+        self.sink.insert_rows([FrozenDBRecord("Arthur Dent", 35)])
+        self.assertFalse(
+            store_record_in_db_if_new([], FrozenDBRecord("Arthur Dent", 35), self.sink)
+        )
+        store: RecordStore = RecordStore(sink=self.sink)
+        self.assertFalse(store.store_record_if_new(FrozenDBRecord("Arthur Dent", 35)))
+        self.assertTrue(FrozenDBRecord("Arthur Dent", 35) in store)
+        result: BatchInsertResult = store.store_records_if_new(
+            [FrozenDBRecord("Arthur Dent", 35), FrozenDBRecord("Trillian", 30)]
+        )
+        self.assertEqual(
+            (result.inserted_count, result[0], result[1]), (1, False, True)
+        )
+        self.assertEqual(result.new_rows, [FrozenDBRecord("Trillian", 30)])
+        self.assertTrue(FrozenDBRecord("Arthur Dent", 35) in store)
+
+
+class TestRecordStoreWithFailingSink(unittest.TestCase):
+    def test_failed_insert_can_be_retried(self) -> None:
+        sink: FailingSink = FailingSink(failures=1)
+        store: RecordStore = RecordStore([FrozenDBRecord("Ford Prefect", 200)], sink)
+        row: FrozenDBRecord = FrozenDBRecord("Arthur Dent", 35)
+        with self.assertRaises(RuntimeError):
+            store.store_record_if_new(row)
+        self.assertFalse(row in store)
+        self.assertEqual(store.rows_with_name("Arthur Dent"), frozenset())
+        self.assertTrue(store.store_record_if_new(row))
+        self.assertEqual(sink.rows, [row])
+
+    def test_failed_batch_can_be_retried(self) -> None:
+        sink: FailingSink = FailingSink(failures=1)
+        store: RecordStore = RecordStore([FrozenDBRecord("Ford Prefect", 200)], sink)
+        batch: list[FrozenDBRecord] = [
+            FrozenDBRecord("Ford Prefect", 200),
+            FrozenDBRecord("Arthur Dent", 35),
+            FrozenDBRecord("Trillian", 30),
+        ]
+        with self.assertRaises(RuntimeError):
+            store.store_records_if_new(batch)
+        self.assertEqual(list(store), [FrozenDBRecord("Ford Prefect", 200)])
+        self.assertEqual(store.rows_with_age(35), frozenset())
+        result: BatchInsertResult = store.store_records_if_new(batch)
+        self.assertEqual(result.new_rows, batch[1:])
+        self.assertEqual(sink.rows, batch[1:])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,170 @@
+"""
+This is a sorted container for records that cannot be hashed, like the
+mutable `DBRecord`, so that checking `row in current_rows` does not have to
+compare against every row.
+
+Items are kept ordered by a user supplied sort key as they are added, so
+`in` can use `bisect` to find the few items with an equal key in O(log n)
+and only compare those with `==`. Because the items are ordered, ranges of
+keys (eg: all records with a given name) can be found the same way.
+
+Note that the items must not be changed in a way that changes their key
+while they are in the container, otherwise the order will be wrong.
+"""
+
+from bisect import bisect_left, bisect_right, insort_right
+from collections.abc import Callable, Iterable, Iterator
+import math
+from typing import Any
+import unittest
+
+from original_function import DBRecord, store_record_in_db_if_new
+
+
+class SortedKeyList[T]:
+    def __init__(self, key: Callable[[T], Any], items: Iterable[T] = ()) -> None:
+        self.key: Callable[[T], Any] = key
+        self._items: list[T] = sorted(items, key=key)
+
+    def add(self, item: T) -> None:
+        """
+        Inserts the item after any items with an equal key.
+        """
+        insort_right(self._items, item, key=self.key)
+
+    def _key_bounds(self, item_key: Any) -> tuple[int, int]:
+        return (
+            bisect_left(self._items, item_key, key=self.key),
+            bisect_right(self._items, item_key, key=self.key),
+        )
+
+    def remove(self, item: T) -> None:
+        """
+        Removes the first item equal to `item`, raising ValueError if none is present.
+        """
+        low, high = self._key_bounds(self.key(item))
+        for index in range(low, high):
+            if self._items[index] == item:
+                del self._items[index]
+                return
+        raise ValueError(f"{item!r} is not in the list")
+
+    def __contains__(self, item: object) -> bool:
+        try:
+            item_key: Any = self.key(item)  # type: ignore
+        except (AttributeError, TypeError):
+            # An item the key cannot handle cannot be equal to one that is stored
+            return False
+        low, high = self._key_bounds(item_key)
+        return any(self._items[index] == item for index in range(low, high))
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def __iter__(self) -> Iterator[T]:
+        return iter(self._items)
+
+    def __getitem__(self, index: int) -> T:
+        return self._items[index]
+
+    def key_range(self, lower_key: Any, upper_key: Any) -> list[T]:
+        """
+        Returns the items with a key from `lower_key` (inclusive) up to
+        `upper_key` (exclusive), in order.
+        """
+        return self._items[
+            bisect_left(self._items, lower_key, key=self.key) : bisect_left(
+                self._items, upper_key, key=self.key
+            )
+        ]
+
+    def items_with_key(self, item_key: Any) -> list[T]:
+        """
+        Returns the items with a key equal to `item_key`, in order.
+        """
+        low, high = self._key_bounds(item_key)
+        return self._items[low:high]
+
+
+def record_key(record: DBRecord) -> tuple[str, int]:
+    return (record.name, record.age)
+
+
+def records_with_name(records: SortedKeyList[DBRecord], name: str) -> list[DBRecord]:
+    """
+    Given records sorted by `record_key`, returns all of them with the given name.
+
+    `(name,)` sorts before any `(name, age)`, and every age sorts before infinity.
+    """
+    return records.key_range((name,), (name, math.inf))
+
+
+###########
+# Testing #
+###########
+class TestSortedKeyList(unittest.TestCase):
+    def setUp(self) -> None:
+        self.records: SortedKeyList[DBRecord] = SortedKeyList(
+            record_key,
+            [
+                DBRecord("Ford Prefect", 200),
+                DBRecord("Arthur Dent", 35),
+                DBRecord("Zaphod Beeblebrox", 200),
+                DBRecord("Arthur Dent", 30),
+            ],
+        )
+
+    def test_items_are_sorted(self) -> None:
+        self.assertEqual(
+            [record_key(record) for record in self.records],
+            [
+                ("Arthur Dent", 30),
+                ("Arthur Dent", 35),
+                ("Ford Prefect", 200),
+                ("Zaphod Beeblebrox", 200),
+            ],
+        )
+
+    def test_add_keeps_order(self) -> None:
+        self.records.add(DBRecord("Marvin", 37))
+        self.assertEqual(self.records[3], DBRecord("Marvin", 37))
+        self.assertEqual(len(self.records), 5)
+
+    def test_in(self) -> None:
+        self.assertTrue(DBRecord("Arthur Dent", 35) in self.records)
+        self.assertFalse(DBRecord("Arthur Dent", 36) in self.records)
+        self.assertFalse(DBRecord("Trillian", 30) in self.records)
+        self.assertFalse("Arthur Dent" in self.records)
+
+    def test_equal_keys_are_compared_with_eq(self) -> None:
+        by_age: SortedKeyList[DBRecord] = SortedKeyList(
+            lambda record: record.age, self.records
+        )
+        self.assertTrue(DBRecord("Zaphod Beeblebrox", 200) in by_age)
+        self.assertFalse(DBRecord("Marvin", 200) in by_age)
+        self.assertEqual(len(by_age.items_with_key(200)), 2)
+
+    def test_remove(self) -> None:
+        self.records.remove(DBRecord("Arthur Dent", 35))
+        self.assertFalse(DBRecord("Arthur Dent", 35) in self.records)
+        with self.assertRaises(ValueError):
+            self.records.remove(DBRecord("Arthur Dent", 35))
+
+    def test_records_with_name(self) -> None:
+        self.assertEqual(
+            records_with_name(self.records, "Arthur Dent"),
+            [DBRecord("Arthur Dent", 30), DBRecord("Arthur Dent", 35)],
+        )
+        self.assertEqual(records_with_name(self.records, "Arthur"), [])
+
+    def test_works_with_store_record_in_db_if_new(self) -> None:
+        self.assertFalse(
+            store_record_in_db_if_new(self.records, DBRecord("Ford Prefect", 200))
+        )
+        self.assertTrue(
+            store_record_in_db_if_new(self.records, DBRecord("Ford Prefect", 201))
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,174 @@
+"""
+The `generate_pair_chunks` generator yields the same pairs as
+`generate_pairs_from_iterable` for numeric inputs, but as chunks of two
+parallel arrays instead of one tuple per pair.
+
+For n values there are n^2 pairs, so at n = 20,000 the tuples alone are
+400 million objects. Here each chunk is a pair of `array.array`s, `left` and
+`right`, where pair i of the chunk is `(left[i], right[i])`. The arrays are
+built a row at a time by repeating and slicing arrays in C, so no Python
+object is created per pair. At most `chunk_size` pairs are held at once,
+which bounds memory at `2 * chunk_size * itemsize` bytes per chunk.
+
+The arrays support the buffer protocol, so a vectorized consumer can wrap
+them without copying, eg: `numpy.frombuffer(left, dtype=numpy.float64)`.
+"""
+
+from array import array
+from collections.abc import Iterable, Iterator
+import time
+import tracemalloc
+import unittest
+
+from generating_permutation_pairs import generate_pairs_from_iterable
+
+DEFAULT_CHUNK_SIZE: int = 1 << 16
+
+# Any numeric typecode, eg: 'q' and 'd' by default, or 'i' and 'f' if asked for
+type NumericArray = array[int] | array[float]
+
+
+def _column_from_values(
+    values: Iterable[int | float], typecode: str | None
+) -> NumericArray:
+    """
+    Given numeric values, returns them as an array, as 64-bit floats ('d') if
+    any value is a float and otherwise as 64-bit ints ('q'), unless
+    `typecode` says otherwise. Arrays are used as they are.
+    """
+    if isinstance(values, array) and typecode in (None, values.typecode):
+        return values
+    values = list(values)
+    if typecode is None:
+        typecode = "d" if any(isinstance(val, float) for val in values) else "q"
+    return array(typecode, values)
+
+
+def generate_pair_chunks(
+    values: Iterable[int | float],
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    typecode: str | None = None,
+) -> Iterator[tuple[NumericArray, NumericArray]]:
+    """
+    Given numeric input values, yields all pairs of permutations as chunks of
+    two parallel arrays of up to `chunk_size` items each.
+
+    For example, an input of [0, 1, 2] with a chunk size of 4 yields:
+    (array('q', [0, 0, 0, 1]), array('q', [0, 1, 2, 0]))
+    (array('q', [1, 1, 2, 2]), array('q', [1, 2, 0, 1]))
+    (array('q', [2]), array('q', [2]))
+    """
+    if chunk_size < 1:
+        raise ValueError(f"chunk_size must be at least 1, got {chunk_size}")
+    column: NumericArray = _column_from_values(values, typecode)
+    num_values: int = len(column)
+    total_pairs: int = num_values * num_values
+
+    for chunk_start in range(0, total_pairs, chunk_size):
+        chunk_stop: int = min(chunk_start + chunk_size, total_pairs)
+        left: NumericArray = array(column.typecode)
+        right: NumericArray = array(column.typecode)
+        flat_index: int = chunk_start
+        # Each step covers the part of one row that is in this chunk
+        while flat_index < chunk_stop:
+            row, col = divmod(flat_index, num_values)
+            count: int = min(num_values - col, chunk_stop - flat_index)
+            left.extend(column[row : row + 1] * count)
+            right.extend(column[col : col + count])
+            flat_index += count
+        yield left, right
+
+
+########
+# Main #
+########
+def main() -> None:
+    num_values: int = 2_000
+    values: list[float] = [float(val) for val in range(num_values)]
+
+    tracemalloc.start()
+    start: float = time.perf_counter()
+    pairs: list[tuple[float, float]] = generate_pairs_from_iterable(values)
+    print(
+        f"generate_pairs_from_iterable: {time.perf_counter() - start:.3f}s"
+        f" for {len(pairs)} pairs, peak {tracemalloc.get_traced_memory()[1] / 2**20:.1f} MiB"
+    )
+    del pairs
+    tracemalloc.reset_peak()
+
+    start = time.perf_counter()
+    num_pairs: int = 0
+    for left, _ in generate_pair_chunks(values):
+        num_pairs += len(left)
+    print(
+        f"generate_pair_chunks: {time.perf_counter() - start:.3f}s"
+        f" for {num_pairs} pairs, peak {tracemalloc.get_traced_memory()[1] / 2**20:.1f} MiB"
+    )
+    tracemalloc.stop()
+
+
+###########
+# Testing #
+###########
+def _pairs_from_chunks(
+    chunks: Iterable[tuple[NumericArray, NumericArray]],
+) -> list[tuple[int | float, int | float]]:
+    return [pair for left, right in chunks for pair in zip(left, right)]
+
+
+class TestGeneratePairChunks(unittest.TestCase):
+    def test_matches_generate_pairs_from_iterable(self) -> None:
+        for num_values in range(6):
+            values: list[int] = list(range(num_values))
+            for chunk_size in (1, 2, 3, num_values + 1, 100):
+                self.assertEqual(
+                    _pairs_from_chunks(generate_pair_chunks(values, chunk_size)),
+                    generate_pairs_from_iterable(values),
+                )
+
+    def test_chunk_sizes(self) -> None:
+        chunks: list[tuple[NumericArray, NumericArray]] = list(
+            generate_pair_chunks(range(3), 4)
+        )
+        self.assertEqual([len(left) for left, _ in chunks], [4, 4, 1])
+        for left, right in chunks:
+            self.assertEqual(len(left), len(right))
+
+    def test_docstring_example(self) -> None:
+        self.assertEqual(
+            list(generate_pair_chunks([0, 1, 2], 4)),
+            [
+                (array("q", [0, 0, 0, 1]), array("q", [0, 1, 2, 0])),
+                (array("q", [1, 1, 2, 2]), array("q", [1, 2, 0, 1])),
+                (array("q", [2]), array("q", [2])),
+            ],
+        )
+
+    def test_typecodes(self) -> None:
+        self.assertEqual(next(generate_pair_chunks([1, 2]))[0].typecode, "q")
+        self.assertEqual(next(generate_pair_chunks([1, 2.5]))[0].typecode, "d")
+        self.assertEqual(
+            next(generate_pair_chunks([1, 2], typecode="f"))[0].typecode, "f"
+        )
+        self.assertEqual(
+            next(generate_pair_chunks(array("i", [1, 2])))[0].typecode, "i"
+        )
+
+    def test_iterator_input(self) -> None:
+        self.assertEqual(
+            _pairs_from_chunks(generate_pair_chunks(iter([0.5, 1.5]))),
+            [(0.5, 0.5), (0.5, 1.5), (1.5, 0.5), (1.5, 1.5)],
+        )
+
+    def test_empty_input(self) -> None:
+        self.assertEqual(list(generate_pair_chunks([])), [])
+
+    def test_invalid_chunk_size(self) -> None:
+        with self.assertRaises(ValueError):
+            next(generate_pair_chunks([1], chunk_size=0))
+
+
+if __name__ == "__main__":
+    main()
+
+    unittest.main()
@@ -0,0 +1,76 @@
+"""
+This file compares reaching F(k) by stepping through `fib_generator` from
+the start against jumping straight to it with `fib_generator(n, start=k)`.
+
+Stepping takes k big int additions, and the numbers grow to about 0.7 * k
+bits, so it is roughly O(k^2) bit operations. Fast doubling takes O(log k)
+multiplications, which Python does with Karatsuba, so it pulls further ahead
+as k grows.
+"""
+
+from collections import deque
+from collections.abc import Callable
+import math
+import time
+import unittest
+
+from generator_example import fib_generator
+
+
+def _best_time(func: Callable[[], int], repeats: int) -> tuple[float, int]:
+    best: float = math.inf
+    result: int = 0
+    for _ in range(repeats):
+        start: float = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def linear_nth_fibonacci(k: int) -> int:
+    """
+    Returns F(k) by consuming the first k + 1 values of `fib_generator`
+    """
+    return deque(fib_generator(k + 1), maxlen=1)[0]
+
+
+def jump_nth_fibonacci(k: int) -> int:
+    """
+    Returns F(k) by starting `fib_generator` at k
+    """
+    return next(fib_generator(1, start=k))
+
+
+########
+# Main #
+########
+def main() -> None:
+    print(f"{'k':>9} {'linear':>10} {'jump-ahead':>11} {'speedup':>9}")
+    for k in (10**3, 10**4, 10**5, 10**6):
+        # The linear generator takes seconds at 10**6, so only time it once there
+        repeats: int = 3 if k < 10**6 else 1
+        linear_seconds, linear_result = _best_time(
+            lambda: linear_nth_fibonacci(k), repeats
+        )
+        jump_seconds, jump_result = _best_time(lambda: jump_nth_fibonacci(k), repeats)
+        assert linear_result == jump_result
+        print(
+            f"{k:>9} {linear_seconds:>9.4f}s {jump_seconds:>10.4f}s"
+            f" {linear_seconds / jump_seconds:>8.0f}x"
+        )
+
+
+###########
+# Testing #
+###########
+class TestNthFibonacci(unittest.TestCase):
+    def test_linear_and_jump_agree(self) -> None:
+        for k in (0, 1, 2, 10, 1000):
+            self.assertEqual(linear_nth_fibonacci(k), jump_nth_fibonacci(k))
+        self.assertEqual(jump_nth_fibonacci(10), 55)
+
+
+if __name__ == "__main__":
+    main()
+
+    unittest.main()
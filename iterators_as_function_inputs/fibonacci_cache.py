@@ -0,0 +1,359 @@
+"""
+This is a shared cache for answering many overlapping "Fibonacci values from
+start to stop" queries without recomputing them each time.
+
+`FibonacciSegmentCache` keeps contiguous runs (segments) of Fibonacci values
+that earlier queries computed. A query copies whatever parts of its range are
+already cached, and only computes the gaps between them. To start a gap it
+uses the nearest cached values as seeds when it can:
+- The two values just before the gap, stepping forward
+- The two values just after the gap, stepping backward (F(k) = F(k+2) - F(k+1))
+- Otherwise, `fibonacci_pair` jumps straight to the start of the gap
+
+Fibonacci numbers grow by about 0.7 bits per index, so one value near 10**6
+is about 10,000 times the size of one near 100. The cache is therefore bounded
+by the total bytes of the values it holds rather than by a number of entries,
+and evicts the least recently used segments once it is over `max_bytes`.
+
+The cache is safe to share between threads. The lock is only held to look up
+and store segments, so computing a large gap does not block other threads'
+cache hits. Hit, miss, eviction and seed counts are kept in `stats`.
+"""
+
+from bisect import bisect_right, insort
+from collections import OrderedDict
+from dataclasses import dataclass
+import random
+import sys
+import threading
+import time
+import unittest
+
+from generator_example import fib_generator, fibonacci_pair
+
+DEFAULT_MAX_BYTES: int = 64 * 1024 * 1024
+
+
+@dataclass
+class SegmentCacheStats:
+    # Values copied from the cache, and values that had to be computed
+    hits: int = 0
+    misses: int = 0
+    # Segments dropped to stay under `max_bytes`
+    evictions: int = 0
+    # How each gap was started: from cached neighbors, or by jumping ahead
+    neighbor_seeds: int = 0
+    jump_seeds: int = 0
+
+
+@dataclass
+class _Gap:
+    # Uncached values F(start) up to but not including F(stop)
+    start: int
+    stop: int
+    # The two cached values just before the gap, or just after it, if any
+    before: tuple[int, int] | None = None
+    after: tuple[int, int] | None = None
+
+
+def _compute_gap(gap: _Gap) -> list[int]:
+    """
+    Returns F(gap.start) up to but not including F(gap.stop), stepping from
+    the cached neighbors when there are any, and otherwise jumping ahead.
+    """
+    count: int = gap.stop - gap.start
+    if gap.before is not None:
+        cur_val: int = gap.before[0] + gap.before[1]
+        next_val: int = cur_val + gap.before[1]
+    elif gap.after is not None:
+        backward: list[int] = []
+        cur_val, next_val = gap.after
+        for _ in range(count):
+            cur_val, next_val = next_val - cur_val, cur_val
+            backward.append(cur_val)
+        backward.reverse()
+        return backward
+    else:
+        cur_val, next_val = fibonacci_pair(gap.start)
+
+    forward: list[int] = []
+    for _ in range(count):
+        forward.append(cur_val)
+        cur_val, next_val = next_val, cur_val + next_val
+    return forward
+
+
+class FibonacciSegmentCache:
+    def __init__(self, max_bytes: int = DEFAULT_MAX_BYTES) -> None:
+        self.max_bytes: int = max_bytes
+        self.current_bytes: int = 0
+        self.stats: SegmentCacheStats = SegmentCacheStats()
+        # Segment start index to its values, least recently used first
+        self._segments: OrderedDict[int, list[int]] = OrderedDict()
+        self._segment_bytes: dict[int, int] = {}
+        # The same starts, sorted, to find the segment covering an index
+        self._starts: list[int] = []
+        self._lock: threading.Lock = threading.Lock()
+
+    def values(self, start: int, stop: int) -> list[int]:
+        """
+        Returns the Fibonacci values F(start) up to but not including F(stop).
+        """
+        if start < 0 or stop < start:
+            raise ValueError(f"Invalid range [{start}, {stop})")
+        result: list[int] = []
+        position: int = start
+        while position < stop:
+            # Only the lookups hold the lock, not the big int arithmetic
+            with self._lock:
+                taken: list[int] = self._take_cached(position, stop)
+                gap: _Gap | None = None if taken else self._plan_gap(position, stop)
+            if gap is None:
+                result.extend(taken)
+                position += len(taken)
+                continue
+
+            computed: list[int] = _compute_gap(gap)
+            size: int = sys.getsizeof(computed) + sum(
+                sys.getsizeof(val) for val in computed
+            )
+            with self._lock:
+                self.stats.misses += len(computed)
+                # Another thread may have cached part of the gap meanwhile
+                if self._is_uncached(gap.start, gap.stop):
+                    self._store(gap.start, computed, size)
+            result.extend(computed)
+            position = gap.stop
+        return result
+
+    def nth(self, k: int) -> int:
+        return self.values(k, k + 1)[0]
+
+    def __len__(self) -> int:
+        """
+        Returns the number of cached segments.
+        """
+        return len(self._segments)
+
+    def _segment_covering(self, index: int) -> int | None:
+        """
+        Returns the start of the cached segment holding F(index), if any.
+        """
+        segment_index: int = bisect_right(self._starts, index) - 1
+        if segment_index < 0:
+            return None
+        segment_start: int = self._starts[segment_index]
+        if index < segment_start + len(self._segments[segment_start]):
+            return segment_start
+        return None
+
+    def _cached_value(self, index: int) -> int | None:
+        segment_start: int | None = self._segment_covering(index)
+        if segment_start is None:
+            return None
+        return self._segments[segment_start][index - segment_start]
+
+    def _is_uncached(self, start: int, stop: int) -> bool:
+        """
+        Returns True if no cached segment holds any of F(start) to F(stop - 1).
+        """
+        if self._segment_covering(start) is not None:
+            return False
+        next_index: int = bisect_right(self._starts, start)
+        return next_index == len(self._starts) or self._starts[next_index] >= stop
+
+    def _take_cached(self, start: int, stop: int) -> list[int]:
+        """
+        Returns the cached values from F(start) towards F(stop), up to the end
+        of the segment holding F(start), or an empty list if it is not cached.
+        """
+        segment_start: int | None = self._segment_covering(start)
+        if segment_start is None:
+            return []
+        self._segments.move_to_end(segment_start)
+        offset: int = start - segment_start
+        taken: list[int] = self._segments[segment_start][offset : offset + stop - start]
+        self.stats.hits += len(taken)
+        return taken
+
+    def _plan_gap(self, start: int, stop: int) -> "_Gap":
+        """
+        Returns the uncached gap from F(start) up to the next cached segment,
+        or F(stop), along with the cached neighbors to seed it from if any.
+        """
+        next_index: int = bisect_right(self._starts, start)
+        gap: _Gap = _Gap(start, stop)
+        if next_index < len(self._starts):
+            gap.stop = min(stop, self._starts[next_index])
+
+        before: tuple[int | None, int | None] = (
+            self._cached_value(start - 2) if start >= 2 else None,
+            self._cached_value(start - 1) if start >= 1 else None,
+        )
+        after: tuple[int | None, int | None] = (
+            self._cached_value(gap.stop),
+            self._cached_value(gap.stop + 1),
+        )
+        if before[0] is not None and before[1] is not None:
+            self.stats.neighbor_seeds += 1
+            gap.before = (before[0], before[1])
+        elif after[0] is not None and after[1] is not None:
+            self.stats.neighbor_seeds += 1
+            gap.after = (after[0], after[1])
+        else:
+            self.stats.jump_seeds += 1
+        return gap
+
+    def _store(self, start: int, segment: list[int], size: int) -> None:
+        if size > self.max_bytes:
+            # It would evict everything else and still not fit
+            return
+        self._segments[start] = segment
+        self._segment_bytes[start] = size
+        insort(self._starts, start)
+        self.current_bytes += size
+        while self.current_bytes > self.max_bytes:
+            evicted_start, _ = self._segments.popitem(last=False)
+            self.current_bytes -= self._segment_bytes.pop(evicted_start)
+            del self._starts[bisect_right(self._starts, evicted_start) - 1]
+            self.stats.evictions += 1
+
+
+########
+# Main #
+########
+def main() -> None:
+    num_queries: int = 2_000
+    query_length: int = 200
+    max_index: int = 50_000
+    queries: list[tuple[int, int]] = []
+    rng: random.Random = random.Random(0)
+    for _ in range(num_queries):
+        # Queries cluster around a few hot spots, so many of them overlap
+        center: int = rng.choice([1_000, 10_000, 25_000, max_index - query_length])
+        start: int = max(0, center + rng.randint(-500, 500))
+        queries.append((start, start + query_length))
+
+    start_time: float = time.perf_counter()
+    for start, stop in queries:
+        list(fib_generator(stop - start, start=start))
+    print(f"fib_generator with start: {time.perf_counter() - start_time:.3f}s")
+
+    for max_bytes in (DEFAULT_MAX_BYTES, 256 * 1024):
+        cache: FibonacciSegmentCache = FibonacciSegmentCache(max_bytes)
+        start_time = time.perf_counter()
+        for start, stop in queries:
+            cache.values(start, stop)
+        print(
+            f"FibonacciSegmentCache({max_bytes} bytes):"
+            f" {time.perf_counter() - start_time:.3f}s, {cache.stats}"
+        )
+
+
+###########
+# Testing #
+###########
+class TestFibonacciSegmentCache(unittest.TestCase):
+    def setUp(self) -> None:
+        self.expected: list[int] = list(fib_generator(500))
+        self.cache: FibonacciSegmentCache = FibonacciSegmentCache()
+
+    def test_values(self) -> None:
+        self.assertEqual(self.cache.values(0, 10), self.expected[:10])
+        self.assertEqual(self.cache.values(100, 150), self.expected[100:150])
+        self.assertEqual(self.cache.values(5, 5), [])
+        self.assertEqual(self.cache.nth(20), 6765)
+
+    def test_repeated_query_hits(self) -> None:
+        self.cache.values(100, 150)
+        self.cache.values(100, 150)
+        self.assertEqual(self.cache.stats.misses, 50)
+        self.assertEqual(self.cache.stats.hits, 50)
+        self.assertEqual(self.cache.stats.jump_seeds, 1)
+
+    def test_overlapping_query_fills_gaps(self) -> None:
+        self.cache.values(100, 150)
+        self.cache.values(200, 250)
+        self.assertEqual(self.cache.values(90, 260), self.expected[90:260])
+        self.assertEqual(self.cache.stats.hits, 100)
+        self.assertEqual(self.cache.stats.misses, 100 + 70)
+
+    def test_seeds_from_neighbors(self) -> None:
+        self.cache.values(100, 150)
+        # Just after a cached segment: step forward from its last two values
+        self.assertEqual(self.cache.values(150, 160), self.expected[150:160])
+        # Just before a cached segment: step backward from its first two values
+        self.assertEqual(self.cache.values(90, 100), self.expected[90:100])
+        self.assertEqual(self.cache.stats.neighbor_seeds, 2)
+        self.assertEqual(self.cache.stats.jump_seeds, 1)
+
+    def test_eviction_by_bytes(self) -> None:
+        small_segment_bytes: int = sys.getsizeof([0] * 10) + 10 * sys.getsizeof(10**40)
+        cache: FibonacciSegmentCache = FibonacciSegmentCache(3 * small_segment_bytes)
+        for start in range(200, 400, 20):
+            self.assertEqual(
+                cache.values(start, start + 10), self.expected[start : start + 10]
+            )
+        self.assertGreater(cache.stats.evictions, 0)
+        self.assertLessEqual(cache.current_bytes, cache.max_bytes)
+        # The most recent query is still cached
+        hits: int = cache.stats.hits
+        cache.values(380, 390)
+        self.assertEqual(cache.stats.hits, hits + 10)
+
+    def test_segment_larger_than_cache_is_not_stored(self) -> None:
+        cache: FibonacciSegmentCache = FibonacciSegmentCache(max_bytes=100)
+        self.assertEqual(cache.values(0, 50), self.expected[:50])
+        self.assertEqual(len(cache), 0)
+        self.assertEqual(cache.current_bytes, 0)
+
+    def test_shared_between_threads(self) -> None:
+        results: list[tuple[int, list[int]]] = []
+        errors: list[BaseException] = []
+
+        def query(offset: int) -> None:
+            try:
+                for start in range(offset, 400, 37):
+                    results.append((start, self.cache.values(start, start + 50)))
+            except BaseException as error:
+                errors.append(error)
+
+        threads: list[threading.Thread] = [
+            threading.Thread(target=query, args=(offset,)) for offset in range(4)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        # Assert here, since a failed assertion in a thread would not fail the test
+        self.assertEqual(errors, [])
+        self.assertEqual(
+            len(results), sum(len(range(offset, 400, 37)) for offset in range(4))
+        )
+        for start, values in results:
+            self.assertEqual(values, self.expected[start : start + 50])
+
+    def test_gap_cached_meanwhile_is_not_stored(self) -> None:
+        # The steps of `values`, with another query caching part of the gap
+        # between planning it and storing it
+        gap: _Gap = self.cache._plan_gap(100, 150)  # type: ignore
+        self.cache.values(120, 130)
+        self.assertEqual(_compute_gap(gap), self.expected[100:150])
+        self.assertFalse(self.cache._is_uncached(100, 150))  # type: ignore
+        self.assertTrue(self.cache._is_uncached(130, 150))  # type: ignore
+        # Querying the whole range again fills in around the cached part
+        self.assertEqual(self.cache.values(100, 150), self.expected[100:150])
+        self.assertEqual(len(self.cache), 3)
+
+    def test_invalid_range(self) -> None:
+        with self.assertRaises(ValueError):
+            self.cache.values(10, 5)
+        with self.assertRaises(ValueError):
+            self.cache.values(-1, 5)
+
+
+if __name__ == "__main__":
+    main()
+
+    unittest.main()
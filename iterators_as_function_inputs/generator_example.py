@@ -10,10 +10,54 @@ import sys
 import unittest
 
 
-def fib_generator(n: int) -> Generator[int]:
+def fibonacci_pair(k: int) -> tuple[int, int]:
     """
-    Returns a generator for the first n Fibonacci values
+    Given k >= 0, returns (F(k), F(k + 1)) using fast doubling:
+    F(2m) = F(m) * (2 * F(m + 1) - F(m))
+    F(2m + 1) = F(m)^2 + F(m + 1)^2
+
+    This takes O(log k) big int multiplications rather than k additions.
+    """
+    if k < 0:
+        raise ValueError(f"k must be at least 0, got {k}")
+    # Start from (F(0), F(1)) and apply the bits of k from the most significant
+    fib_m: int = 0
+    fib_m_plus_1: int = 1
+    for bit in bin(k)[2:]:
+        fib_2m: int = fib_m * (2 * fib_m_plus_1 - fib_m)
+        fib_2m_plus_1: int = fib_m * fib_m + fib_m_plus_1 * fib_m_plus_1
+        if bit == "1":
+            fib_m, fib_m_plus_1 = fib_2m_plus_1, fib_2m + fib_2m_plus_1
+        else:
+            fib_m, fib_m_plus_1 = fib_2m, fib_2m_plus_1
+    return fib_m, fib_m_plus_1
+
+
+def nth_fibonacci(k: int) -> int:
+    """
+    Returns F(k), where F(0) = 0 and F(1) = 1
+    """
+    return fibonacci_pair(k)[0]
+
+
+def fib_generator(n: int, start: int = 0) -> Generator[int]:
+    """
+    Returns a generator for the first n Fibonacci values, or for the n values
+    from F(start) onwards when start is given.
+
+    The generator jumps straight to F(start) with `fibonacci_pair`, rather than
+    stepping through every earlier value.
     """
+    if start < 0:
+        raise ValueError(f"start must be at least 0, got {start}")
+    if start > 0:
+        if n >= 1:
+            cur_val, next_val = fibonacci_pair(start)
+            for _ in range(n):
+                yield cur_val
+                cur_val, next_val = next_val, cur_val + next_val
+        return
+
     if n >= 1:
         # If there is at least one return, the first value is 0
         yield 0
@@ -80,6 +124,43 @@ class TestFibGenerator(unittest.TestCase):
         output_list: list[int] = list(fib_generator(10))
         self.assertCountEqual(output_list, [0, 1, 1, 2, 3, 5, 8, 13, 21, 34])
 
+    def test_fib_generator_with_start(self) -> None:
+        self.assertEqual(list(fib_generator(4, start=5)), [5, 8, 13, 21])
+        self.assertEqual(list(fib_generator(3, start=0)), [0, 1, 1])
+        self.assertEqual(list(fib_generator(0, start=5)), [])
+
+    def test_fib_generator_with_start_matches_linear(self) -> None:
+        linear: list[int] = list(fib_generator(300))
+        for start in range(1, 250, 7):
+            self.assertEqual(
+                list(fib_generator(50, start=start)), linear[start : start + 50]
+            )
+
+    def test_fib_generator_negative_start_raises(self) -> None:
+        with self.assertRaises(ValueError):
+            list(fib_generator(1, start=-1))
+
+
+class TestNthFibonacci(unittest.TestCase):
+    def test_matches_generator(self) -> None:
+        for k, val in enumerate(fib_generator(500)):
+            self.assertEqual(nth_fibonacci(k), val)
+
+    def test_fibonacci_pair(self) -> None:
+        self.assertEqual(fibonacci_pair(0), (0, 1))
+        self.assertEqual(fibonacci_pair(10), (55, 89))
+
+    def test_large_k(self) -> None:
+        fib_k, fib_k_plus_1 = fibonacci_pair(10_000)
+        # Cassini's identity: F(k-1) * F(k+1) - F(k)^2 = (-1)^k
+        fib_k_minus_1: int = fib_k_plus_1 - fib_k
+        self.assertEqual(fib_k_minus_1 * fib_k_plus_1 - fib_k * fib_k, 1)
+        self.assertEqual(len(str(fib_k)), 2090)
+
+    def test_negative_k_raises(self) -> None:
+        with self.assertRaises(ValueError):
+            nth_fibonacci(-1)
+
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,246 @@
+"""
+This file is a deeper version of the comparison in `generator_example.main`.
+
+`sys.getsizeof` is shallow: for a list it counts the array of pointers but
+not the int objects they point to, and Fibonacci ints grow by about 0.7 bits
+per index. For a generator it counts the generator and its frame, but not
+the objects the frame refers to. Here each representation of the first n
+Fibonacci values is measured four ways:
+- shallow: `sys.getsizeof`, as in `generator_example.main`
+- deep: `deep_getsizeof`, which follows `gc.get_referents` recursively
+- traced: bytes allocated and still held after building it, from `tracemalloc` snapshots
+- peak RSS: growth in the peak resident set size while building it and
+  consuming every value, measured in a fresh process for each cell
+
+The representations are a generator, a list, a tuple, and an `array('Q')`.
+An array can only hold values up to 2^64 - 1, which is F(93), so it is
+left out of the table for larger n.
+"""
+
+from array import array
+from collections.abc import Callable, Iterable
+from concurrent.futures import ProcessPoolExecutor
+import gc
+import multiprocessing
+import os
+import sys
+import tracemalloc
+from types import CodeType, FunctionType, ModuleType
+import unittest
+
+from generator_example import fib_generator
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows, so peak RSS is only reported where /proc is
+    resource = None
+
+# Objects shared by every instance, so not part of any one object's footprint
+SHARED_TYPES: tuple[type, ...] = (type, ModuleType, FunctionType, CodeType)
+
+# The largest n for which every one of the first n values fits in a 'Q' array
+MAX_ARRAY_N: int = 94
+
+REPRESENTATIONS: dict[str, Callable[[int], Iterable[int]]] = {
+    "generator": fib_generator,
+    "list": lambda n: list(fib_generator(n)),
+    "tuple": lambda n: tuple(fib_generator(n)),
+    "array": lambda n: array("Q", fib_generator(n)),
+}
+
+
+def deep_getsizeof(obj: object) -> int:
+    """
+    Given an object, returns the size in bytes of it and of every object it
+    refers to, directly or indirectly, counting each object once.
+
+    Types, modules, functions and code objects are not followed, since they
+    are shared rather than owned.
+    """
+    seen: set[int] = set()
+    total: int = 0
+    pending: list[object] = [obj]
+    while pending:
+        current: object = pending.pop()
+        if id(current) in seen or isinstance(current, SHARED_TYPES):
+            continue
+        seen.add(id(current))
+        total += sys.getsizeof(current)
+        pending.extend(gc.get_referents(current))
+    return total
+
+
+def traced_bytes(build: Callable[[], object]) -> int:
+    """
+    Returns the bytes allocated by `build` that are still held while its
+    result is alive, from the difference of two `tracemalloc` snapshots.
+    """
+    tracemalloc.start()
+    try:
+        before: tracemalloc.Snapshot = tracemalloc.take_snapshot()
+        built: object = build()
+        after: tracemalloc.Snapshot = tracemalloc.take_snapshot()
+    finally:
+        tracemalloc.stop()
+    del built
+    return sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+
+
+def _peak_rss() -> int:
+    """
+    Returns the peak resident set size of this process, in bytes.
+    """
+    # Linux carries ru_maxrss over from the parent across exec, so a new
+    # process would start with the parent's peak. VmHWM starts from zero.
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    assert resource is not None
+    # ru_maxrss is in bytes on macOS
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def _peak_rss_growth(representation: str, n: int) -> int:
+    """
+    Runs in a fresh process. Builds the representation, consumes every value,
+    and returns how far the peak RSS grew, in bytes.
+    """
+    baseline: int = _peak_rss()
+    values: Iterable[int] = REPRESENTATIONS[representation](n)
+    for _ in values:
+        pass
+    return _peak_rss() - baseline
+
+
+def peak_rss_growth(representation: str, n: int) -> int | None:
+    """
+    Returns the growth in peak RSS from building and consuming the
+    representation, measured in a new process since the peak never goes
+    down. Returns None if peak RSS is not available on this platform.
+    """
+    if resource is None and not os.path.exists("/proc/self/status"):
+        return None
+    with ProcessPoolExecutor(
+        max_workers=1, mp_context=multiprocessing.get_context("spawn")
+    ) as executor:
+        return executor.submit(_peak_rss_growth, representation, n).result()
+
+
+def profile(n: int, representation: str) -> dict[str, int | None] | None:
+    """
+    Returns the shallow, deep, traced and peak RSS sizes in bytes of the
+    representation of the first n Fibonacci values, or None if the
+    representation cannot hold them.
+    """
+    if representation == "array" and n > MAX_ARRAY_N:
+        return None
+    build: Callable[[], Iterable[int]] = lambda: REPRESENTATIONS[representation](n)
+    values: Iterable[int] = build()
+    return {
+        "shallow": sys.getsizeof(values),
+        "deep": deep_getsizeof(values),
+        "traced": traced_bytes(build),
+        "peak RSS": peak_rss_growth(representation, n),
+    }
+
+
+########
+# Main #
+########
+def main() -> None:
+    columns: list[str] = ["shallow", "deep", "traced", "peak RSS"]
+    print(f"{'n':>7} {'representation':>14}" + "".join(f"{col:>12}" for col in columns))
+    for fib_n in [10, 90, 1000, 10_000, 50_000]:
+        for representation in REPRESENTATIONS:
+            sizes: dict[str, int | None] | None = profile(fib_n, representation)
+            if sizes is None:
+                cells: list[str] = ["n/a"] * len(columns)
+            else:
+                cells = [
+                    "n/a" if sizes[col] is None else str(sizes[col]) for col in columns
+                ]
+            print(
+                f"{fib_n:>7} {representation:>14}"
+                + "".join(f"{cell:>12}" for cell in cells)
+            )
+
+
+###########
+# Testing #
+###########
+class TestDeepGetsizeof(unittest.TestCase):
+    def test_counts_referred_objects(self) -> None:
+        values: list[int] = [10**100, 10**200]
+        self.assertEqual(
+            deep_getsizeof(values),
+            sys.getsizeof(values) + sum(sys.getsizeof(val) for val in values),
+        )
+
+    def test_counts_shared_objects_once(self) -> None:
+        val: int = 10**100
+        values: list[int] = [val, val, val]
+        self.assertEqual(
+            deep_getsizeof(values), sys.getsizeof(values) + sys.getsizeof(val)
+        )
+
+    def test_handles_cycles(self) -> None:
+        values: list[object] = []
+        values.append(values)
+        self.assertEqual(deep_getsizeof(values), sys.getsizeof(values))
+
+    def test_list_is_deeper_than_shallow(self) -> None:
+        values: list[int] = list(fib_generator(1000))
+        self.assertGreater(deep_getsizeof(values), 5 * sys.getsizeof(values))
+
+    def test_skips_shared_types(self) -> None:
+        self.assertEqual(
+            deep_getsizeof([fib_generator]), sys.getsizeof([fib_generator])
+        )
+        self.assertEqual(deep_getsizeof(fib_generator), 0)
+
+
+class TestProfile(unittest.TestCase):
+    def test_traced_bytes(self) -> None:
+        self.assertGreater(traced_bytes(lambda: list(fib_generator(1000))), 40_000)
+        self.assertLess(traced_bytes(lambda: fib_generator(1000)), 2_000)
+
+    def test_array_limit(self) -> None:
+        self.assertEqual(
+            list(REPRESENTATIONS["array"](MAX_ARRAY_N)),
+            list(fib_generator(MAX_ARRAY_N)),
+        )
+        with self.assertRaises(OverflowError):
+            REPRESENTATIONS["array"](MAX_ARRAY_N + 1)
+        self.assertIsNone(profile(MAX_ARRAY_N + 1, "array"))
+
+    def test_profile(self) -> None:
+        sizes: dict[str, int | None] | None = profile(100, "tuple")
+        assert sizes is not None
+        shallow: int | None = sizes["shallow"]
+        deep: int | None = sizes["deep"]
+        assert shallow is not None and deep is not None
+        self.assertEqual(shallow, sys.getsizeof(tuple(fib_generator(100))))
+        self.assertGreater(deep, shallow)
+
+    @unittest.skipIf(
+        resource is None and not os.path.exists("/proc/self/status"),
+        "Peak RSS is not available on this platform",
+    )
+    def test_peak_rss_growth(self) -> None:
+        # The list of the first 20,000 values holds about 20 MB of ints
+        list_growth: int | None = peak_rss_growth("list", 20_000)
+        generator_growth: int | None = peak_rss_growth("generator", 20_000)
+        assert list_growth is not None and generator_growth is not None
+        self.assertGreater(list_growth, 10_000_000)
+        self.assertLess(generator_growth, list_growth)
+
+
+if __name__ == "__main__":
+    main()
+
+    unittest.main()
@@ -0,0 +1,198 @@
+"""
+The `generate_pairs_lazily` generator yields the same pairs as
+`generate_pairs_from_iterable`, one at a time, and also works on iterators.
+
+The original builds a list of all n^2 pairs, and for an iterator the inner
+loop drains the same iterator the outer loop is reading, so most pairs are
+lost. Here the input is only iterated once. Each value is paired with itself
+and with every value before it as soon as it arrives, so pairs start flowing
+before the whole input has been seen.
+
+The values seen so far are kept in a `SpillBuffer`, which holds them in
+memory until their estimated size reaches `memory_limit` bytes, then appends
+the rest to a temporary file. A `Sequence` input is not buffered at all,
+since it can be indexed again directly.
+"""
+
+from collections.abc import Iterable, Iterator, Sequence
+from itertools import islice
+import pickle
+import sys
+import tempfile
+from typing import IO
+import unittest
+
+DEFAULT_MEMORY_LIMIT: int = 64 * 1024 * 1024
+
+
+class SpillBuffer[T]:
+    """
+    An append-only buffer that moves to a temporary file once the values in
+    memory reach `memory_limit` bytes, as estimated by `sys.getsizeof`.
+
+    Values written to the file must be picklable.
+    """
+
+    def __init__(self, memory_limit: int = DEFAULT_MEMORY_LIMIT) -> None:
+        self.memory_limit: int = memory_limit
+        self.memory_bytes: int = 0
+        self._in_memory: list[T] = []
+        self._file: IO[bytes] | None = None
+        self._spilled_count: int = 0
+
+    def append(self, val: T) -> None:
+        if self._file is None:
+            size: int = sys.getsizeof(val)
+            if self.memory_bytes + size <= self.memory_limit:
+                self._in_memory.append(val)
+                self.memory_bytes += size
+                return
+            self._file = tempfile.TemporaryFile()
+        self._file.seek(0, 2)
+        pickle.dump(val, self._file, pickle.HIGHEST_PROTOCOL)
+        self._spilled_count += 1
+
+    @property
+    def spilled_count(self) -> int:
+        return self._spilled_count
+
+    def __len__(self) -> int:
+        return len(self._in_memory) + self._spilled_count
+
+    def __iter__(self) -> Iterator[T]:
+        """
+        Yields the values appended so far, first from memory and then from the file.
+        """
+        spilled_count: int = self._spilled_count
+        yield from islice(self._in_memory, len(self._in_memory))
+        if self._file is None:
+            return
+        self._file.seek(0)
+        for _ in range(spilled_count):
+            yield pickle.load(self._file)
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        self._in_memory.clear()
+        self.memory_bytes = 0
+        self._spilled_count = 0
+
+
+def generate_pairs_lazily[T](
+    input_iterable: Iterable[T], memory_limit: int = DEFAULT_MEMORY_LIMIT
+) -> Iterator[tuple[T, T]]:
+    """
+    Given an input iterable, yields pairs of all possible permutations.
+
+    For example, an input of [0, 1, 2] yields:
+    (0, 0), (0, 1), (1, 0), (1, 1), (0, 2), (2, 0), (1, 2), (2, 1), (2, 2)
+
+    The input is only iterated once, so an iterator works as well as a list.
+    All pairs involving a value are yielded as soon as it is read.
+    """
+    if isinstance(input_iterable, Sequence):
+        for index, new_val in enumerate(input_iterable):
+            for old_val in islice(input_iterable, index):
+                yield (old_val, new_val)
+                yield (new_val, old_val)
+            yield (new_val, new_val)
+        return
+
+    seen: SpillBuffer[T] = SpillBuffer(memory_limit)
+    try:
+        for new_val in input_iterable:
+            for old_val in seen:
+                yield (old_val, new_val)
+                yield (new_val, old_val)
+            yield (new_val, new_val)
+            seen.append(new_val)
+    finally:
+        seen.close()
+
+
+###########
+# Testing #
+###########
+def _expected_pairs(values: list[int]) -> list[tuple[int, int]]:
+    return [(val_1, val_2) for val_1 in values for val_2 in values]
+
+
+class TestGeneratePairsLazily(unittest.TestCase):
+    def test_empty_input(self) -> None:
+        self.assertCountEqual(generate_pairs_lazily([]), [])
+
+    def test_list(self) -> None:
+        for length in range(5):
+            values: list[int] = list(range(length))
+            self.assertCountEqual(
+                generate_pairs_lazily(values), _expected_pairs(values)
+            )
+
+    def test_empty_iter(self) -> None:
+        self.assertCountEqual(generate_pairs_lazily(iter([])), [])
+
+    def test_iter(self) -> None:
+        for length in range(5):
+            values: list[int] = list(range(length))
+            self.assertCountEqual(
+                generate_pairs_lazily(iter(values)), _expected_pairs(values)
+            )
+
+    def test_order(self) -> None:
+        self.assertEqual(
+            list(generate_pairs_lazily(iter([0, 1, 2]))),
+            [(0, 0), (0, 1), (1, 0), (1, 1), (0, 2), (2, 0), (1, 2), (2, 1), (2, 2)],
+        )
+        self.assertEqual(
+            list(generate_pairs_lazily([0, 1, 2])),
+            list(generate_pairs_lazily(iter([0, 1, 2]))),
+        )
+
+    def test_pairs_flow_before_input_ends(self) -> None:
+        def values_then_error() -> Iterator[int]:
+            yield 0
+            yield 1
+            raise RuntimeError("Input ended early")
+
+        pairs: Iterator[tuple[int, int]] = generate_pairs_lazily(values_then_error())
+        self.assertCountEqual(
+            [next(pairs) for _ in range(4)], [(0, 0), (0, 1), (1, 0), (1, 1)]
+        )
+        with self.assertRaises(RuntimeError):
+            next(pairs)
+
+    def test_spills_to_disk(self) -> None:
+        values: list[int] = list(range(50))
+        for memory_limit in (0, 200, DEFAULT_MEMORY_LIMIT):
+            self.assertCountEqual(
+                generate_pairs_lazily(iter(values), memory_limit),
+                _expected_pairs(values),
+            )
+
+
+class TestSpillBuffer(unittest.TestCase):
+    def test_stays_in_memory_under_limit(self) -> None:
+        buffer: SpillBuffer[int] = SpillBuffer()
+        for val in range(10):
+            buffer.append(val)
+        self.assertEqual(list(buffer), list(range(10)))
+        self.assertEqual(buffer.spilled_count, 0)
+
+    def test_spills_over_limit(self) -> None:
+        buffer: SpillBuffer[str] = SpillBuffer(memory_limit=3 * sys.getsizeof("a"))
+        for val in "abcdef":
+            buffer.append(val)
+        self.assertEqual(len(buffer), 6)
+        self.assertEqual(buffer.spilled_count, 3)
+        self.assertEqual("".join(buffer), "abcdef")
+        # Reading does not stop later appends from going to the end
+        buffer.append("g")
+        self.assertEqual("".join(buffer), "abcdefg")
+        buffer.close()
+        self.assertEqual(list(buffer), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,184 @@
+"""
+The `PairSpace` view gives random access to the pairs that
+`generate_pairs_from_iterable` would build, without building them.
+
+The pair at any flat index is computed directly from the index, so `len`,
+indexing, slicing and sharding are all O(1) however large the input is, and
+only the pairs actually read are ever created. Slices and shards are
+themselves `PairSpace` views, backed by a `range` of flat indices.
+
+There are four kinds of pair, chosen with `ordered` and `replacement`:
+- ordered, with replacement: every (a, b), like `itertools.product`
+- ordered, without replacement: a and b at different positions, like `itertools.permutations`
+- unordered, with replacement: a at or before b, like `itertools.combinations_with_replacement`
+- unordered, without replacement: a before b, like `itertools.combinations`
+
+The unordered kinds are for symmetric work, where (a, b) and (b, a) give the
+same answer, and have about half as many pairs.
+"""
+
+from collections.abc import Iterable, Iterator, Sequence
+from itertools import (
+    combinations,
+    combinations_with_replacement,
+    permutations,
+    product,
+)
+import math
+from typing import overload
+import unittest
+
+
+class PairSpace[T](Sequence[tuple[T, T]]):
+    def __init__(
+        self,
+        values: Iterable[T],
+        ordered: bool = True,
+        replacement: bool = True,
+        _indices: range | None = None,
+    ) -> None:
+        """
+        Given the input values (copied to a tuple unless already a Sequence),
+        creates a view of the pairs of the chosen kind, in the same order as
+        the matching `itertools` function.
+        """
+        self.values: Sequence[T] = (
+            values if isinstance(values, Sequence) else tuple(values)
+        )
+        self.ordered: bool = ordered
+        self.replacement: bool = replacement
+        self._indices: range = (
+            range(self._total_pairs()) if _indices is None else _indices
+        )
+
+    def _total_pairs(self) -> int:
+        n: int = len(self.values)
+        if self.ordered:
+            return n * n if self.replacement else n * (n - 1)
+        return n * (n + 1) // 2 if self.replacement else n * (n - 1) // 2
+
+    def _pair_at(self, flat_index: int) -> tuple[T, T]:
+        """
+        Given an index into the whole pair space, returns that pair.
+        """
+        n: int = len(self.values)
+        if self.ordered:
+            if self.replacement:
+                row, col = divmod(flat_index, n)
+            else:
+                row, col = divmod(flat_index, n - 1)
+                # Skip the diagonal
+                col += col >= row
+            return (self.values[row], self.values[col])
+
+        # Row r holds `row_length - r` pairs, so it starts at r * row_length - r(r-1)/2
+        row_length: int = n if self.replacement else n - 1
+        twice_length: int = 2 * row_length + 1
+        row = (
+            twice_length - math.isqrt(twice_length * twice_length - 8 * flat_index)
+        ) // 2
+        # isqrt rounds down, so the estimate can be one row out either way
+        while row * row_length - row * (row - 1) // 2 > flat_index:
+            row -= 1
+        while (row + 1) * row_length - (row + 1) * row // 2 <= flat_index:
+            row += 1
+        row_start: int = row * row_length - row * (row - 1) // 2
+        col = row + (flat_index - row_start) + (not self.replacement)
+        return (self.values[row], self.values[col])
+
+    def __len__(self) -> int:
+        return len(self._indices)
+
+    @overload
+    def __getitem__(self, index: int) -> tuple[T, T]: ...
+
+    @overload
+    def __getitem__(self, index: slice) -> "PairSpace[T]": ...
+
+    def __getitem__(self, index: int | slice) -> "tuple[T, T] | PairSpace[T]":
+        if isinstance(index, slice):
+            return PairSpace(
+                self.values, self.ordered, self.replacement, self._indices[index]
+            )
+        return self._pair_at(self._indices[index])
+
+    def __iter__(self) -> Iterator[tuple[T, T]]:
+        for flat_index in self._indices:
+            yield self._pair_at(flat_index)
+
+    def shard(self, shard_index: int, num_shards: int) -> "PairSpace[T]":
+        """
+        Returns every `num_shards`-th pair starting from `shard_index`, so that
+        shards 0 to `num_shards - 1` together cover every pair exactly once.
+        """
+        if not 0 <= shard_index < num_shards:
+            raise ValueError(
+                f"shard_index must be in [0, {num_shards}), got {shard_index}"
+            )
+        return self[shard_index::num_shards]
+
+    def __repr__(self) -> str:
+        return (
+            f"PairSpace(len={len(self)}, ordered={self.ordered},"
+            f" replacement={self.replacement})"
+        )
+
+
+###########
+# Testing #
+###########
+class TestPairSpace(unittest.TestCase):
+    def test_matches_itertools(self) -> None:
+        for length in range(7):
+            values: list[int] = list(range(length))
+            for ordered, replacement, expected in (
+                (True, True, list(product(values, repeat=2))),
+                (True, False, list(permutations(values, 2))),
+                (False, True, list(combinations_with_replacement(values, 2))),
+                (False, False, list(combinations(values, 2))),
+            ):
+                space: PairSpace[int] = PairSpace(values, ordered, replacement)
+                self.assertEqual(len(space), len(expected))
+                self.assertEqual(list(space), expected)
+                self.assertEqual([space[i] for i in range(len(space))], expected)
+
+    def test_negative_index(self) -> None:
+        space: PairSpace[str] = PairSpace("abc")
+        self.assertEqual(space[-1], ("c", "c"))
+        with self.assertRaises(IndexError):
+            space[9]
+
+    def test_slicing(self) -> None:
+        space: PairSpace[int] = PairSpace(range(4), ordered=False)
+        expected: list[tuple[int, int]] = list(
+            combinations_with_replacement(range(4), 2)
+        )
+        self.assertEqual(list(space[2:7]), expected[2:7])
+        self.assertEqual(list(space[::-3]), expected[::-3])
+        self.assertEqual(list(space[1:][::2]), expected[1:][::2])
+
+    def test_shards_cover_every_pair_once(self) -> None:
+        space: PairSpace[int] = PairSpace(range(10), replacement=False)
+        shards: list[PairSpace[int]] = [space.shard(k, 3) for k in range(3)]
+        self.assertEqual(sum(len(shard) for shard in shards), len(space))
+        self.assertCountEqual([pair for shard in shards for pair in shard], list(space))
+        with self.assertRaises(ValueError):
+            space.shard(3, 3)
+
+    def test_huge_input(self) -> None:
+        n: int = 10**9
+        space: PairSpace[int] = PairSpace(range(n), ordered=False, replacement=False)
+        self.assertEqual(len(space), n * (n - 1) // 2)
+        self.assertEqual(space[0], (0, 1))
+        self.assertEqual(space[-1], (n - 2, n - 1))
+        self.assertEqual(space[n - 1], (1, 2))
+        self.assertEqual(len(space.shard(5, 8)), len(range(5, len(space), 8)))
+
+    def test_iterator_input_is_copied(self) -> None:
+        space: PairSpace[int] = PairSpace(iter([0, 1]))
+        self.assertEqual(list(space), [(0, 0), (0, 1), (1, 0), (1, 1)])
+        self.assertEqual(list(space), [(0, 0), (0, 1), (1, 0), (1, 1)])
+
+
+if __name__ == "__main__":
+    unittest.main()
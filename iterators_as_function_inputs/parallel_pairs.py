@@ -0,0 +1,249 @@
+"""
+The `map_pairs` engine applies a function to every pair that
+`generate_pairs_from_iterable` would build, across a pool of processes.
+
+The pairs are never built as a list. Instead the rows of the n x n pair
+space, one row per first value, are split into blocks that are handed out
+to the workers. The input values and the functions are sent to each worker
+only once, when it starts, so a block is described by just its row range.
+
+With a `reduce` function, each worker reduces its block to one partial
+result, and only those are sent back, as each block finishes. Results come
+back in pair order when `ordered` is True, or as soon as they are ready
+otherwise.
+
+Starting the pool and sending the input has a fixed cost, so this only pays
+off when there are many pairs or `fn` is slow. `main` prints the time for
+1 up to `os.cpu_count()` workers against a serial loop.
+"""
+
+from collections import deque
+from collections.abc import Callable, Generator, Iterable, Iterator, Sequence
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+import functools
+import math
+import operator
+import os
+import time
+from typing import Any
+import unittest
+
+from generating_permutation_pairs import generate_pairs_from_iterable
+
+# Each worker gets several blocks so that one slow block does not hold up the end
+BLOCKS_PER_WORKER: int = 4
+
+# Set in each worker process by `_init_worker`. Each `map_pairs` call can pass
+# functions of different types, so here they take and return any object.
+_worker_values: Sequence[object] = ()
+_worker_fn: Callable[..., object] | None = None
+_worker_reduce: Callable[..., object] | None = None
+
+
+def _init_worker(
+    values: Sequence[object],
+    fn: Callable[..., object],
+    reduce: Callable[..., object] | None,
+) -> None:
+    global _worker_values, _worker_fn, _worker_reduce
+    _worker_values = values
+    _worker_fn = fn
+    _worker_reduce = reduce
+
+
+def _map_row_block(row_start: int, row_stop: int) -> list[object]:
+    """
+    Runs in a worker process. Applies `fn` to every pair whose first value is
+    in rows [row_start, row_stop), returning the results in pair order, or a
+    single partial result if there is a `reduce` function.
+    """
+    assert _worker_fn is not None
+    results: Iterator[object] = (
+        _worker_fn(val_1, val_2)
+        for val_1 in _worker_values[row_start:row_stop]
+        for val_2 in _worker_values
+    )
+    if _worker_reduce is None:
+        return list(results)
+    return [functools.reduce(_worker_reduce, results)]
+
+
+def map_pairs[T, R](
+    fn: Callable[[T, T], R],
+    iterable: Iterable[T],
+    reduce: Callable[[R, R], R] | None = None,
+    ordered: bool = True,
+    max_workers: int | None = None,
+    rows_per_block: int | None = None,
+) -> Generator[R]:
+    """
+    Given a function of two values and an input iterable, yields the function
+    applied to all pairs of permutations of the input.
+
+    With a `reduce` function, yields one partial reduction per block of rows
+    instead. `functools.reduce(reduce, map_pairs(...))` then gives the full
+    reduction, as long as `reduce` is associative (and also commutative when
+    `ordered` is False).
+
+    `fn`, `reduce` and the values must be picklable, so the functions must be
+    defined at the top level of a module.
+    """
+    if rows_per_block is not None and rows_per_block < 1:
+        raise ValueError(f"rows_per_block must be at least 1, got {rows_per_block}")
+    values: tuple[T, ...] = tuple(iterable)
+    if not values:
+        return
+    num_workers: int = max_workers or os.cpu_count() or 1
+    if rows_per_block is None:
+        rows_per_block = math.ceil(len(values) / (num_workers * BLOCKS_PER_WORKER))
+    blocks: Iterator[range] = (
+        range(row_start, min(row_start + rows_per_block, len(values)))
+        for row_start in range(0, len(values), rows_per_block)
+    )
+    # Limit the blocks in flight, so unreduced results do not pile up in memory
+    max_in_flight: int = 2 * num_workers
+
+    with ProcessPoolExecutor(
+        max_workers=num_workers,
+        initializer=_init_worker,
+        initargs=(values, fn, reduce),
+    ) as executor:
+        try:
+            if ordered:
+                # The workers' results come from `fn` or `reduce`, so are all R
+                in_order: deque[Future[list[Any]]] = deque()
+                for block in blocks:
+                    in_order.append(
+                        executor.submit(_map_row_block, block.start, block.stop)
+                    )
+                    if len(in_order) >= max_in_flight:
+                        yield from in_order.popleft().result()
+                while in_order:
+                    yield from in_order.popleft().result()
+            else:
+                pending: set[Future[list[Any]]] = set()
+                for block in blocks:
+                    pending.add(
+                        executor.submit(_map_row_block, block.start, block.stop)
+                    )
+                    if len(pending) >= max_in_flight:
+                        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                        for future in done:
+                            yield from future.result()
+                while pending:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        yield from future.result()
+        finally:
+            # If the caller stopped early, do not start the remaining blocks
+            executor.shutdown(wait=True, cancel_futures=True)
+
+
+########
+# Main #
+########
+def _score(val_1: float, val_2: float) -> float:
+    total: float = 0.0
+    for step in range(1, 20):
+        total += math.sqrt(abs(val_1 - val_2) + step) / step
+    return total
+
+
+def main() -> None:
+    values: list[float] = [float(val) for val in range(800)]
+
+    start: float = time.perf_counter()
+    expected: float = sum(
+        _score(val_1, val_2) for val_1, val_2 in generate_pairs_from_iterable(values)
+    )
+    serial_seconds: float = time.perf_counter() - start
+    print(f"Serial over {len(values) ** 2} pairs: {serial_seconds:.3f}s")
+
+    for num_workers in range(1, (os.cpu_count() or 1) + 1):
+        start = time.perf_counter()
+        total: float = functools.reduce(
+            operator.add,
+            map_pairs(
+                _score, values, operator.add, ordered=False, max_workers=num_workers
+            ),
+        )
+        seconds: float = time.perf_counter() - start
+        assert math.isclose(total, expected)
+        print(
+            f"map_pairs with {num_workers} workers: {seconds:.3f}s"
+            f" ({serial_seconds / seconds:.2f}x serial)"
+        )
+
+
+###########
+# Testing #
+###########
+def _product(val_1: int, val_2: int) -> int:
+    return val_1 * val_2
+
+
+def _difference(val_1: int, val_2: int) -> int:
+    return val_1 - val_2
+
+
+class TestMapPairs(unittest.TestCase):
+    def setUp(self) -> None:
+        self.values: list[int] = list(range(7))
+        self.expected: list[int] = [
+            _difference(val_1, val_2)
+            for val_1, val_2 in generate_pairs_from_iterable(self.values)
+        ]
+
+    def test_ordered(self) -> None:
+        self.assertEqual(
+            list(map_pairs(_difference, self.values, max_workers=2, rows_per_block=2)),
+            self.expected,
+        )
+
+    def test_unordered(self) -> None:
+        self.assertCountEqual(
+            map_pairs(
+                _difference,
+                self.values,
+                ordered=False,
+                max_workers=2,
+                rows_per_block=3,
+            ),
+            self.expected,
+        )
+
+    def test_reduce_streams_one_partial_per_block(self) -> None:
+        partials: list[int] = list(
+            map_pairs(
+                _product, self.values, operator.add, max_workers=2, rows_per_block=3
+            )
+        )
+        # Rows 0-2, 3-5 and 6
+        self.assertEqual(partials, [3 * 21, 12 * 21, 6 * 21])
+        self.assertEqual(sum(partials), sum(self.values) ** 2)
+
+    def test_iterator_input(self) -> None:
+        self.assertEqual(
+            list(map_pairs(_difference, iter(self.values), max_workers=2)),
+            self.expected,
+        )
+
+    def test_empty_input(self) -> None:
+        self.assertEqual(list(map_pairs(_product, [], operator.add)), [])
+
+    def test_invalid_rows_per_block(self) -> None:
+        with self.assertRaises(ValueError):
+            next(map_pairs(_product, self.values, rows_per_block=0))
+
+    def test_stopping_early(self) -> None:
+        results: Generator[int] = map_pairs(
+            _product, range(50), max_workers=2, rows_per_block=1
+        )
+        self.assertEqual([next(results) for _ in range(3)], [0, 0, 0])
+        results.close()
+
+
+if __name__ == "__main__":
+    main()
+
+    unittest.main()